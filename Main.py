@@ -1,78 +1,129 @@
 ﻿import os
+import hashlib
+import io
+import json
 import discord
 from discord.ext import commands
 from discord import app_commands
 from typing import Literal
 from dotenv import load_dotenv
-import aiosqlite
+from archive import SeasonArchive
+from autocomplete import PrefixIndex
+from bulk_import import BulkImportError, echo, read_rows, validate_row
+from config_service import ConfigService
+from database import db
+from export import export_season, iter_season_rows
+from history import PER_PAGE, fetch_page, season_points
+from leaderboard import Leaderboards
+from metrics import Metrics
+from migrations import migrate
+from notifications import STAT_EMOJIS, NotificationDispatcher, StatChange
+from offers import OfferStore
+from profile_cache import ProfileCache
+from role_jobs import RoleJobs
+from scoring import rank_for, scoring
+from stats import DIVISION_CODES, DIVISION_NAMES, POSITIONS, STAT_CODES, STAT_COLUMNS, STAT_NAMES, apply_stat_delta, apply_stat_deltas, rebuild_aggregates
+from team_registry import TeamRegistry
+from team_stats import TeamStats, add_members, remove_members, remove_team, replace_members
+from totw import FORMATIONS, award, gameweek_points, pick_team
+from writer import WriteCoalescer
 
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
+# Hash of the last command tree pushed to Discord
+COMMAND_HASH_PATH = os.getenv("VRFS_COMMAND_HASH_PATH", ".command_tree_hash")
+# Prometheus text file refreshed by the metrics task
+METRICS_PATH = os.getenv("VRFS_METRICS_PATH", "metrics.prom")
+# Discord's limit on a message's content
+MESSAGE_LIMIT = 2000
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
-bot = commands.Bot(command_prefix="/", intents=intents)
-
-# Initialize database
-async def init_db():
-    async with aiosqlite.connect('vrfs_stats.db') as db:
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS player_stats (
-                user_id INTEGER PRIMARY KEY,
-                goals INTEGER DEFAULT 0,
-                assists INTEGER DEFAULT 0,
-                cleansheets_defender INTEGER DEFAULT 0,
-                cleansheets_goalkeeper INTEGER DEFAULT 0,
-                motm INTEGER DEFAULT 0,
-                totw INTEGER DEFAULT 0,
-                position TEXT
-            )
-        ''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS player_gw_stats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                gw INTEGER,
-                season INTEGER,
-                stat_type TEXT,
-                count INTEGER,
-                division TEXT DEFAULT 'Div 1',
-                FOREIGN KEY(user_id) REFERENCES player_stats(user_id)
-            )
-        ''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS config (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-        ''')
-        # Initialize default GW and Season
-        await db.execute('INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)', ('current_gw', '1'))
-        await db.execute('INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)', ('current_season', '1'))
-        await db.commit()
-
-# --- Add teams table to DB if missing ---
-async def ensure_teams_table():
-    async with aiosqlite.connect('vrfs_stats.db') as db:
-        await db.execute('''CREATE TABLE IF NOT EXISTS teams (team_name TEXT PRIMARY KEY, division TEXT)''')
-        await db.commit()
-
-# Patch DB init to ensure teams table
-old_init_db2 = init_db
-async def patched_init_db2():
-    await old_init_db2()
-    try:
-        await ensure_teams_table()
-    except Exception:
-        pass
-init_db = patched_init_db2
 
-@bot.event
-async def on_ready():
-    print(f"{bot.user} has connected to Discord!")
-    await init_db()
-    # Force global and per-guild command sync
+class NovaTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Autocomplete requests never fire a completion event, so they aren't timed as commands
+        if interaction.type is not discord.InteractionType.autocomplete:
+            metrics.start_command(interaction)
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        metrics.finish_command(interaction, failed=True)
+        await super().on_error(interaction, error)
+
+# Sharded so large deployments can spread guilds across gateway connections
+class NovaBot(commands.AutoShardedBot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commands_checked = False
+
+    async def setup_hook(self):
+        # Runs once per process, before the gateway connects
+        await db.connect()
+        await migrate(db)
+        writer.start()
+        await config.load()
+        await archive.load()
+        await teams.load(db)
+        await scoring.load(db)
+        await leaderboards.load(db)
+        notifier.start()
+        # Buttons on offers sent before a restart still route here
+        self.add_dynamic_items(OfferButton)
+        offers.start(expire_offer)
+        # Bulk releases interrupted by a restart carry on where they stopped
+        await role_jobs.resume(remove_team_role, report_role_job)
+        db.on_query = metrics.record_query
+        writer.on_write = metrics.record_write
+        metrics.instrument_http(self.http)
+        metrics.start(METRICS_PATH)
+
+    async def close(self):
+        await metrics.stop()
+        await notifier.stop()
+        await offers.stop()
+        await role_jobs.stop()
+        await writer.stop()
+        await super().close()
+        await db.close()
+
+# Waits longer than this raise discord.RateLimited instead of sleeping, so bulk role
+# jobs and DM workers can pause and requeue rather than block a worker for minutes
+bot = NovaBot(command_prefix="/", intents=intents, tree_cls=NovaTree, max_ratelimit_timeout=30)
+writer = WriteCoalescer(db)
+config = ConfigService(db, writer)
+archive = SeasonArchive(db)
+leaderboards = Leaderboards()
+notifier = NotificationDispatcher(db)
+offers = OfferStore(db, writer)
+role_jobs = RoleJobs(db, writer)
+metrics = Metrics()
+profiles = ProfileCache()
+teams = TeamRegistry()
+team_stats = TeamStats()
+stat_type_index = PrefixIndex(STAT_CODES)
+metrics.register_counters(lambda: [
+    ("nova_profile_cache_hits_total", "Profile lookups served from the cache.", profiles.hits),
+    ("nova_profile_cache_misses_total", "Profile lookups that queried the database.", profiles.misses),
+    ("nova_profile_cache_coalesced_total", "Profile lookups that waited on another request's query.", profiles.coalesced),
+    ("nova_profile_cache_evictions_total", "Profiles dropped to stay under the cache size limit.", profiles.evictions),
+])
+
+def command_tree_hash() -> str:
+    payload = [command.to_dict(bot.tree) for command in bot.tree.get_commands()]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+# Sync global and per-guild commands, skipping it if the tree is unchanged since the last sync
+async def sync_commands(force: bool = False) -> bool:
+    tree_hash = command_tree_hash()
+    try:
+        with open(COMMAND_HASH_PATH) as f:
+            synced_hash = f.read().strip()
+    except FileNotFoundError:
+        synced_hash = None
+    if not force and synced_hash == tree_hash:
+        return False
     await bot.tree.sync()
     for guild in bot.guilds:
         try:
@@ -80,21 +131,149 @@ async def on_ready():
             print(f"Synced commands to guild: {guild.name} ({guild.id})")
         except Exception as e:
             print(f"Failed to sync to guild {guild.name}: {e}")
-    print("Forced global command sync.")
-    print(f"Synced {len(bot.tree._get_all_commands())} command(s)")
+    with open(COMMAND_HASH_PATH, "w") as f:
+        f.write(tree_hash)
+    print(f"Synced {len(bot.tree.get_commands())} command(s)")
+    return True
+
+@bot.event
+async def on_ready():
+    print(f"{bot.user} has connected to Discord!")
+    # on_ready fires again after every reconnect; only check the tree once per process
+    if not bot.commands_checked:
+        bot.commands_checked = True
+        if not await sync_commands(force=os.getenv("FORCE_COMMAND_SYNC") == "1"):
+            print("Command tree unchanged, skipped sync.")
     # Set custom status
     activity = discord.Activity(type=discord.ActivityType.watching, name="⭐ NOVA")
     await bot.change_presence(activity=activity)
 
+@bot.event
+async def on_shard_ready(shard_id: int):
+    print(f"Shard {shard_id} is ready")
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    metrics.finish_command(interaction)
+
+async def store_team_roles(guild_id: int, changed: list):
+    async def update_roles(conn):
+        await conn.executemany(
+            'UPDATE teams SET role_id = ? WHERE guild_id = ? AND team_name = ?',
+            [(role_id, guild_id, team_name) for team_name, role_id in changed]
+        )
+    await writer.submit(update_roles)
+
+@bot.event
+async def on_guild_available(guild: discord.Guild):
+    # Fires once the guild's roles and members are cached, at startup and after an outage
+    changed = teams.bind_guild(guild)
+    if changed:
+        await store_team_roles(guild.id, changed)
+    # Rosters may have changed while we were away, so the stored copy is rebuilt from the roles
+    async def store_rosters(conn):
+        await replace_members(conn, guild.id, teams.memberships(guild.id))
+    await writer.submit(store_rosters)
+    team_stats.invalidate(guild.id)
+
+@bot.event
+async def on_guild_join(guild: discord.Guild):
+    await on_guild_available(guild)
+
+@bot.event
+async def on_guild_unavailable(guild: discord.Guild):
+    teams.forget_guild(guild.id)
+
+@bot.event
+async def on_guild_remove(guild: discord.Guild):
+    teams.forget_guild(guild.id)
+
+@bot.event
+async def on_guild_role_create(role: discord.Role):
+    # A team whose role was deleted and later recreated becomes selectable again
+    if teams.role_created(role):
+        await store_team_roles(role.guild.id, [(role.name, role.id)])
+
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    if before.name != after.name:
+        teams.role_name_changed(after.guild.id, before.name, after.name)
+    team = teams.by_role(after.guild.id, after.id)
+    # Compared with the team's name, which can lag the role's after a rename was refused
+    if team is None or team.name == after.name:
+        return
+    old_name = team.name
+    if old_name.lower() != after.name.lower() and teams.is_registered(after.guild.id, after.name):
+        # Team names are unique, so the team keeps its name until the role gets a free one
+        print(f"Team role {after.id} in guild {after.guild.id} was renamed to '{after.name}', which another team already uses; keeping '{old_name}'")
+        return
+    async def rename_team(conn):
+        await conn.execute('UPDATE teams SET team_name = ? WHERE guild_id = ? AND team_name = ?', (after.name, after.guild.id, old_name))
+    await writer.submit(rename_team)
+    teams.role_renamed(after, old_name)
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    if teams.role_deleted(role) is None:
+        return
+    async def drop_roster(conn):
+        await remove_team(conn, role.guild.id, role.id)
+    await writer.submit(drop_roster)
+    team_stats.invalidate(role.guild.id)
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    if before.roles == after.roles:
+        return
+    joined, left = teams.member_updated(before, after)
+    if not joined and not left:
+        return
+    async def update_roster(conn):
+        await add_members(conn, after.guild.id, [(role_id, after.id) for role_id in joined])
+        await remove_members(conn, after.guild.id, [(role_id, after.id) for role_id in left])
+    await writer.submit(update_roster)
+    team_stats.invalidate(after.guild.id)
+
+@bot.event
+async def on_member_remove(member: discord.Member):
+    left = teams.member_removed(member.guild.id, member.id)
+    if not left:
+        return
+    async def update_roster(conn):
+        await remove_members(conn, member.guild.id, [(role_id, member.id) for role_id in left])
+    await writer.submit(update_roster)
+    team_stats.invalidate(member.guild.id)
+
 # Check if user has moderator permissions
 def is_moderator(interaction: discord.Interaction) -> bool:
     return interaction.user.guild_permissions.administrator or interaction.user.guild.permissions.moderate_members
 
+# Resolve a typed team name to its role; only registered teams with an existing role count
+def resolve_team(guild: discord.Guild, name: str):
+    team = teams.lookup(guild.id, name)
+    return guild.get_role(team.role_id) if team else None
+
+async def team_autocomplete(interaction: discord.Interaction, current: str) -> list:
+    return [app_commands.Choice(name=name, value=name) for name in teams.search(interaction.guild_id, current)]
+
+async def stat_type_autocomplete(interaction: discord.Interaction, current: str) -> list:
+    return [app_commands.Choice(name=name, value=name) for name in stat_type_index.search(current)]
+
 # Test command (anyone can use)
 @bot.tree.command(name="ping", description="Check bot latency")
 async def ping(interaction: discord.Interaction):
     await interaction.response.send_message(f"Pong! {round(bot.latency * 1000)}ms")
 
+# Force command sync (admins only)
+@bot.tree.command(name="synccommands", description="Force a sync of the bot's slash commands")
+async def synccommands(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("❌ You don't have permission to use this command")
+        return
+    await interaction.response.defer()
+    await sync_commands(force=True)
+    await interaction.followup.send(f"✅ Synced {len(bot.tree.get_commands())} command(s)")
+
 # Kick command
 @bot.tree.command(name="kick", description="Kick a user from the server")
 @app_commands.describe(member="User to kick", reason="Reason for kicking")
@@ -197,11 +376,16 @@ async def deletechannels(interaction: discord.Interaction, count: str):
 
 # Sign command
 @bot.tree.command(name="sign", description="Sign a user to a team (with confirmation)")
-@app_commands.describe(member="Player to sign", team="Team role to assign", club_badge_url="URL of the club badge (optional)")
-async def sign(interaction: discord.Interaction, member: discord.Member, team: discord.Role, club_badge_url: str = None):
+@app_commands.describe(member="Player to sign", team="Registered team to sign them to", club_badge_url="URL of the club badge (optional)")
+@app_commands.autocomplete(team=team_autocomplete)
+async def sign(interaction: discord.Interaction, member: discord.Member, team: str, club_badge_url: str = None):
     if not is_moderator(interaction):
         await interaction.response.send_message("❌ You don't have permission to use this command")
         return
+    team = resolve_team(interaction.guild, team)
+    if team is None:
+        await interaction.response.send_message("❌ That isn't a registered team. Pick one from the suggestions.")
+        return
     # Prepare DM embed
     embed = discord.Embed(title="VFA.GG Transactions", description=f"**Signing Offer**\n{team.name} have submitted a signing offer for {member.mention}.", color=discord.Color.blue())
     embed.set_author(name="NOVA", icon_url=bot.user.display_avatar.url)
@@ -210,38 +394,11 @@ async def sign(interaction: discord.Interaction, member: discord.Member, team: d
     embed.add_field(name="Player", value=member.mention, inline=False)
     embed.add_field(name="Club", value=team.name, inline=True)
     embed.add_field(name="Additional Info", value="Use the buttons below to accept or decline.", inline=False)
-    view = SignConfirmView(member, team, interaction.user, interaction)
-    try:
-        await member.send(embed=embed, view=view)
+    if await send_offer(interaction, member, team, "sign", embed):
         await interaction.response.send_message(f"Sent signing confirmation to {member.mention}.")
-    except Exception:
+    else:
         await interaction.response.send_message(f"❌ Could not DM {member.mention}. They may have DMs closed.")
 
-# --- Signing Confirmation View ---
-class SignConfirmView(discord.ui.View):
-    def __init__(self, member: discord.Member, team: discord.Role, moderator: discord.Member, interaction: discord.Interaction):
-        super().__init__(timeout=180)
-        self.member = member
-        self.team = team
-        self.moderator = moderator
-        self.interaction = interaction
-        self.value = None
-
-    @discord.ui.button(label="Agree", style=discord.ButtonStyle.success)
-    async def agree(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.member.add_roles(self.team)
-        await interaction.response.send_message(f"You have agreed to join {self.team.name}!", ephemeral=True)
-        await self.interaction.followup.send(f"✅ {self.member.mention} has agreed to join {self.team.mention}.")
-        self.value = True
-        self.stop()
-
-    @discord.ui.button(label="Disagree", style=discord.ButtonStyle.danger)
-    async def disagree(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.send_message("You have declined the signing.", ephemeral=True)
-        await self.interaction.followup.send(f"❌ {self.member.mention} has declined the signing to {self.team.mention}.")
-        self.value = False
-        self.stop()
-
 # Release command
 @bot.tree.command(name="release", description="Release a user from their team")
 @app_commands.describe(member="Player to release")
@@ -249,13 +406,193 @@ async def release(interaction: discord.Interaction, member: discord.Member):
     if not is_moderator(interaction):
         await interaction.response.send_message("❌ You don't have permission to use this command")
         return
-    team_roles = [role for role in member.roles if role != member.guild.default_role]
+    # Only team roles are taken away; any other roles the player has are left alone
+    team_roles = [role for role in (member.guild.get_role(team.role_id) for team in teams.teams_of(member.guild.id, member.id)) if role]
     if team_roles:
         await member.remove_roles(*team_roles)
         await interaction.response.send_message(f"📤 {member} has been released from {', '.join([r.mention for r in team_roles])}")
     else:
         await interaction.response.send_message(f"{member} is not assigned to any team")
 
+# --- Bulk releases ---
+async def remove_team_role(guild_id: int, user_id: int, role_id: int):
+    # Straight to the REST route, so members missing from the cache can still be released
+    await bot.http.remove_role(guild_id, user_id, role_id, reason="Bulk team release")
+
+async def report_role_job(job):
+    if job.message_id is None:
+        return
+    if job.status == "done":
+        text = f"✅ {job.label}: removed {job.done} team role(s)"
+        if job.failed:
+            text += f", {job.failed} failed"
+    else:
+        text = f"🔄 {job.label}: {job.done + job.failed}/{job.total} team role(s) removed..."
+    await bot.get_partial_messageable(job.channel_id).get_partial_message(job.message_id).edit(content=text)
+
+async def start_role_job(interaction: discord.Interaction, kind: str, label: str, memberships: list):
+    if not memberships:
+        await interaction.response.send_message(f"❌ Nothing to do: {label.lower()} found no players on a team.")
+        return
+    # Reserved before any await, so two commands sent together can't both start a job
+    if not role_jobs.reserve(interaction.guild_id):
+        await interaction.response.send_message("❌ Another bulk release is still running in this server. Wait for it to finish.")
+        return
+    try:
+        job = await role_jobs.create(interaction.guild_id, kind, label, memberships, interaction.channel_id)
+    except BaseException:
+        role_jobs.release(interaction.guild_id)
+        raise
+    try:
+        await interaction.response.send_message(f"✅ Started: {label.lower()} ({len(memberships)} team role(s)). Progress is posted in this channel.", ephemeral=True)
+        # A plain channel message, unlike the interaction response, stays editable after a restart
+        if interaction.channel_id:
+            try:
+                message = await bot.get_partial_messageable(interaction.channel_id).send(f"🔄 {label}: 0/{job.total} team role(s) removed...")
+                await role_jobs.set_message(job, message.id)
+            except discord.HTTPException:
+                pass
+    finally:
+        # The job is stored, so it runs even if the replies fail
+        role_jobs.start(job, remove_team_role, report_role_job)
+
+# Release team command
+@bot.tree.command(name="releaseteam", description="Release every player from a team")
+@app_commands.describe(team="Registered team to release")
+@app_commands.autocomplete(team=team_autocomplete)
+async def releaseteam(interaction: discord.Interaction, team: str):
+    if not is_moderator(interaction):
+        await interaction.response.send_message("❌ You don't have permission to use this command")
+        return
+    registered = teams.lookup(interaction.guild_id, team)
+    if registered is None:
+        await interaction.response.send_message("❌ That isn't a registered team. Pick one from the suggestions.")
+        return
+    memberships = await db.fetchall('''
+        SELECT m.role_id, m.user_id
+        FROM teams t
+        JOIN team_members m ON m.guild_id = t.guild_id AND m.role_id = t.role_id
+        WHERE t.guild_id = ? AND t.team_name = ?
+    ''', (interaction.guild_id, registered.name))
+    await start_role_job(interaction, "releaseteam", f"Releasing {registered.name}", memberships)
+
+# Reset season command
+@bot.tree.command(name="resetseason", description="Release every player from every team to start a new season")
+@app_commands.describe(division="Only release teams in this division (leave empty for all)", confirm="Set to True to release the squads")
+async def resetseason(interaction: discord.Interaction, confirm: bool, division: Literal["Div 1", "Div 2", "Div 3"] = None):
+    if not is_moderator(interaction):
+        await interaction.response.send_message("❌ You don't have permission to use this command")
+        return
+    if not confirm:
+        await interaction.response.send_message("❌ This releases every squad. Run it again with confirm set to True.")
+        return
+    if division:
+        memberships = await db.fetchall('''
+            SELECT m.role_id, m.user_id
+            FROM teams t
+            JOIN team_members m ON m.guild_id = t.guild_id AND m.role_id = t.role_id
+            WHERE t.guild_id = ? AND t.division = ?
+        ''', (interaction.guild_id, division))
+    else:
+        memberships = await db.fetchall('''
+            SELECT role_id, user_id FROM team_members WHERE guild_id = ?
+        ''', (interaction.guild_id,))
+    label = f"Season reset ({division})" if division else "Season reset"
+    await start_role_job(interaction, "resetseason", label, memberships)
+
+# Squad command
+@bot.tree.command(name="squad", description="List the players on a team")
+@app_commands.describe(team="Registered team")
+@app_commands.autocomplete(team=team_autocomplete)
+@app_commands.guild_only()
+async def squad(interaction: discord.Interaction, team: str):
+    registered = teams.lookup(interaction.guild_id, team)
+    if registered is None:
+        await interaction.response.send_message("❌ That isn't a registered team. Pick one from the suggestions.")
+        return
+    member_ids = sorted(registered.member_ids)
+    positions = {}
+    if member_ids:
+        positions = dict(await db.fetchall(
+            f"SELECT user_id, position FROM player_stats WHERE guild_id = ? AND user_id IN ({', '.join('?' * len(member_ids))})",
+            (interaction.guild_id, *member_ids)
+        ))
+    by_position = {}
+    for user_id in member_ids:
+        by_position.setdefault(positions.get(user_id) or "Not set", []).append(f"<@{user_id}>")
+    role = interaction.guild.get_role(registered.role_id)
+    embed = discord.Embed(
+        title=f"👥 {registered.name}",
+        description=f"{registered.division} - {len(member_ids)} player(s)",
+        color=role.color if role else discord.Color.gold()
+    )
+    for position in POSITIONS + ["Not set"]:
+        if position in by_position:
+            mentions = by_position[position]
+            value = ", ".join(mentions)
+            # Embed fields hold at most 1024 characters
+            if len(value) > 1024:
+                shown = value[:1000].rsplit(", ", 1)[0]
+                value = f"{shown} and {len(mentions) - shown.count(', ') - 1} more"
+            embed.add_field(name=position, value=value, inline=False)
+    if not member_ids:
+        embed.add_field(name="Players", value="No players signed yet.", inline=False)
+    await interaction.response.send_message(embed=embed)
+
+# Team stats command
+@bot.tree.command(name="teamstats", description="View a team's combined stats and points for a season")
+@app_commands.describe(team="Registered team", season="Season (leave empty for the current season)")
+@app_commands.autocomplete(team=team_autocomplete)
+@app_commands.guild_only()
+async def teamstats(interaction: discord.Interaction, team: str, season: int = None):
+    registered = teams.lookup(interaction.guild_id, team)
+    if registered is None:
+        await interaction.response.send_message("❌ That isn't a registered team. Pick one from the suggestions.")
+        return
+    if season is None:
+        season = config.get_int(interaction.guild_id, 'current_season')
+    gw = config.get_int(interaction.guild_id, 'current_gw')
+    stats, points = await team_stats.team(db, interaction.guild_id, registered.role_id, season, gw)
+    role = interaction.guild.get_role(registered.role_id)
+    embed = discord.Embed(
+        title=f"📈 {registered.name} - Season {season}",
+        description=f"{registered.division} - {len(registered.member_ids)} current player(s)",
+        color=role.color if role else discord.Color.gold()
+    )
+    embed.add_field(name="Points", value=points, inline=False)
+    for stat_type in STAT_COLUMNS:
+        embed.add_field(name=f"{STAT_EMOJIS[stat_type]} {stat_type.capitalize()}", value=stats.get(stat_type, 0), inline=True)
+    embed.set_footer(text="Totals of the team's current players")
+    await interaction.response.send_message(embed=embed)
+
+# Standings command
+@bot.tree.command(name="standings", description="Rank a division's teams by their players' points")
+@app_commands.describe(division="Division", season="Season (leave empty for the current season)")
+@app_commands.guild_only()
+async def standings(interaction: discord.Interaction, division: Literal["Div 1", "Div 2", "Div 3"], season: int = None):
+    if season is None:
+        season = config.get_int(interaction.guild_id, 'current_season')
+    gw = config.get_int(interaction.guild_id, 'current_gw')
+    totals = await team_stats.division(db, interaction.guild_id, division, season, gw)
+    table = sorted(
+        ((team, *totals.get(team.role_id, ({}, 0))) for team in teams.in_division(interaction.guild_id, division)),
+        key=lambda entry: (-entry[2], -entry[1].get("goal", 0), entry[0].name.lower())
+    )
+    embed = discord.Embed(title=f"🏟️ {division} Standings", description=f"Season {season}", color=discord.Color.gold())
+    if table:
+        embed.add_field(
+            name="Table",
+            value="\n".join(
+                f"`#{i + 1}` **{team.name}** - **{points}** pts "
+                f"({STAT_EMOJIS['goal']} {stats.get('goal', 0)} {STAT_EMOJIS['assist']} {stats.get('assist', 0)})"
+                for i, (team, stats, points) in enumerate(table)
+            ),
+            inline=False
+        )
+    else:
+        embed.add_field(name="Table", value="No teams in this division yet.", inline=False)
+    await interaction.response.send_message(embed=embed)
+
 # Welcome command
 @bot.tree.command(name="welcome", description="Send a welcome message to a channel")
 @app_commands.describe(channel="Channel to send welcome message", message="Welcome message")
@@ -278,71 +615,26 @@ async def goodbye(interaction: discord.Interaction, member: discord.Member):
 # Profile command
 @bot.tree.command(name="profile", description="View a player's profile and stats")
 @app_commands.describe(member="Player to view (leave empty for yourself)")
+@app_commands.guild_only()
 async def profile(interaction: discord.Interaction, member: discord.Member = None):
     if member is None:
         member = interaction.user
     
-    # Fetch position
-    async with aiosqlite.connect('vrfs_stats.db') as db:
-        async with db.execute('SELECT position FROM player_stats WHERE user_id = ?', (member.id,)) as cursor:
-            row = await cursor.fetchone()
-            position = row[0] if row and row[0] else "Not set"
-    
-    async with aiosqlite.connect('vrfs_stats.db') as db:
-        async with db.execute('''
-            SELECT stat_type, SUM(count) as total
-            FROM player_gw_stats
-            WHERE user_id = ?
-            GROUP BY stat_type
-        ''', (member.id,)) as cursor:
-            stats_data = await cursor.fetchall()
-    
-    stats = {
-        "goal": 0,
-        "assist": 0,
-        "defender cleansheet": 0,
-        "goalkeeper cleansheet": 0,
-        "totw": 0,
-        "motm": 0
-    }
-    
-    if stats_data:
-        for stat_type, total in stats_data:
-            if stat_type in stats:
-                stats[stat_type] = total
-    
-    # Point values by division and stat type
-    div_points = {
-        "Div 1": {"goal": 9, "assist": 7, "defender cleansheet": 10, "goalkeeper cleansheet": 12, "motm": 8, "totw": 8},
-        "Div 2": {"goal": 6, "assist": 5, "defender cleansheet": 8, "goalkeeper cleansheet": 10, "motm": 6, "totw": 6},
-        "Div 3": {"goal": 3, "assist": 2, "defender cleansheet": 6, "goalkeeper cleansheet": 8, "motm": 3, "totw": 3}
-    }
-    
-    # Calculate points from player_gw_stats with division-based values
-    points = 0
-    if stats_data:
-        async with aiosqlite.connect('vrfs_stats.db') as db:
-            async with db.execute('''
-                SELECT stat_type, division, SUM(count) as total
-                FROM player_gw_stats
-                WHERE user_id = ?
-                GROUP BY stat_type, division
-            ''', (member.id,)) as cursor:
-                gw_stats = await cursor.fetchall()
-        
-        for stat_type, division, total in gw_stats:
-            if division in div_points and stat_type in div_points[division]:
-                points += div_points[division][stat_type] * total
-    
-    # Determine rank
-    if points >= 300:
-        rank = "🔶 Platinum"
-    elif points >= 194:
-        rank = "🟡 Gold"
-    elif points >= 84:
-        rank = "⚪ Silver"
-    else:
-        rank = "🟤 Bronze"
+    async def load_profile():
+        # Position, totals and points are all maintained on the player's row
+        row = await db.fetchone('''
+            SELECT position, goals, assists, cleansheets_defender, cleansheets_goalkeeper, motm, totw,
+                   points_div1 + points_div2 + points_div3
+            FROM player_stats
+            WHERE guild_id = ? AND user_id = ?
+        ''', (interaction.guild_id, member.id))
+        if row is None:
+            row = (None, 0, 0, 0, 0, 0, 0, 0)
+        stats = dict(zip(["goal", "assist", "defender cleansheet", "goalkeeper cleansheet", "motm", "totw"], row[1:7]))
+        return row[0] or "Not set", stats, row[7]
+    position, stats, points = await profiles.get((interaction.guild_id, member.id), load_profile)
+    
+    rank = rank_for(points)
     
     embed = discord.Embed(title=member.display_name, description=f"@{member.name}", color=discord.Color.gold())
     embed.set_author(name="NOVA", icon_url=bot.user.display_avatar.url)
@@ -361,6 +653,21 @@ async def profile(interaction: discord.Interaction, member: discord.Member = Non
     
     await interaction.response.send_message(embed=embed)
 
+# Set position command
+@bot.tree.command(name="setposition", description="Set the position a player is listed at")
+@app_commands.describe(member="Player", position="Position")
+async def setposition(interaction: discord.Interaction, member: discord.Member, position: Literal["GK", "DEF", "MID", "FWD"]):
+    if not is_moderator(interaction):
+        await interaction.response.send_message("❌ You don't have permission to use this command")
+        return
+    
+    async def write_position(conn):
+        await conn.execute('INSERT OR IGNORE INTO player_stats (guild_id, user_id) VALUES (?, ?)', (interaction.guild_id, member.id))
+        await conn.execute('UPDATE player_stats SET position = ? WHERE guild_id = ? AND user_id = ?', (position, interaction.guild_id, member.id))
+    await writer.submit(write_position)
+    profiles.bump(interaction.guild_id, member.id)
+    await interaction.response.send_message(f"✅ {member.mention} is now listed as {position}")
+
 # Set current GW and Season command
 @bot.tree.command(name="set", description="Set current GameWeek and Season")
 @app_commands.describe(gw="GameWeek (1-22)", season="Season (1, 2, or 3)")
@@ -374,11 +681,11 @@ async def set_gw_season(interaction: discord.Interaction, gw: int, season: int):
     if season not in [1, 2, 3]:
         await interaction.response.send_message("❌ Season must be 1, 2, or 3")
         return
+    if archive.is_closed(interaction.guild_id, season):
+        await interaction.response.send_message(f"❌ Season {season} is closed")
+        return
     
-    async with aiosqlite.connect('vrfs_stats.db') as db:
-        await db.execute('UPDATE config SET value = ? WHERE key = ?', (str(gw), 'current_gw'))
-        await db.execute('UPDATE config SET value = ? WHERE key = ?', (str(season), 'current_season'))
-        await db.commit()
+    await config.set_many(interaction.guild_id, {'current_gw': gw, 'current_season': season})
     
     await interaction.response.send_message(f"✅ Set current GW to {gw} and Season to {season}")
 
@@ -392,6 +699,7 @@ async def set_gw_season(interaction: discord.Interaction, gw: int, season: int):
     count="Number of stats to add",
     division="Division (Div 1, Div 2, or Div 3)"
 )
+@app_commands.autocomplete(stat_type=stat_type_autocomplete)
 async def addstat(
     interaction: discord.Interaction,
     member: discord.Member,
@@ -421,66 +729,27 @@ async def addstat(
         await interaction.response.send_message("❌ Count must be greater than 0")
         return
     
-    async with aiosqlite.connect('vrfs_stats.db') as db:
-        async with db.execute('SELECT value FROM config WHERE key = ?', ('current_gw',)) as cursor:
-            current_gw = int((await cursor.fetchone())[0])
-        async with db.execute('SELECT value FROM config WHERE key = ?', ('current_season',)) as cursor:
-            current_season = int((await cursor.fetchone())[0])
+    current_gw = config.get_int(interaction.guild_id, 'current_gw')
+    current_season = config.get_int(interaction.guild_id, 'current_season')
     
     if gw != current_gw or season != current_season:
         await interaction.response.send_message(f"❌ You can only add stats to the current GW! Current: GW{current_gw} Season {current_season}")
         return
     
-    async with aiosqlite.connect('vrfs_stats.db') as db:
-        await db.execute('INSERT OR IGNORE INTO player_stats (user_id) VALUES (?)', (member.id,))
-        await db.execute('''
-            INSERT INTO player_gw_stats (user_id, gw, season, stat_type, count, division)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (member.id, gw, season, stat_type.lower(), count, division))
-        await db.commit()
+    async def record_stat(conn):
+        await conn.execute('''
+            INSERT INTO player_gw_stats (guild_id, user_id, gw, season, stat_type, count, division)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (interaction.guild_id, member.id, gw, season, STAT_CODES[stat_type.lower()], count, DIVISION_CODES[division]))
+        await apply_stat_delta(conn, interaction.guild_id, member.id, stat_type.lower(), division, count)
+    await writer.submit(record_stat)
+    profiles.bump(interaction.guild_id, member.id)
+    team_stats.invalidate(interaction.guild_id)
+    leaderboards.apply(interaction.guild_id, member.id, season, division, stat_type.lower(), count)
     
+    await interaction.response.send_message(f"✅ Added {count} {stat_type.lower()} to {member.mention} in {division} (GW{gw} Season {season})")
     # DM the user about the stat update
-    try:
-        # Get new totals for this division
-        async with aiosqlite.connect('vrfs_stats.db') as db:
-            async with db.execute('''
-                SELECT stat_type, SUM(count) as total
-                FROM player_gw_stats
-                WHERE user_id = ? AND division = ?
-                GROUP BY stat_type
-            ''', (member.id, division)) as cursor:
-                div_stats = {row[0]: row[1] for row in await cursor.fetchall()}
-        # Points for this stat
-        div_points = {
-            "Div 1": {"goal": 9, "assist": 7, "defender cleansheet": 10, "goalkeeper cleansheet": 12, "motm": 8, "totw": 8},
-            "Div 2": {"goal": 6, "assist": 5, "defender cleansheet": 8, "goalkeeper cleansheet": 10, "motm": 6, "totw": 6},
-            "Div 3": {"goal": 3, "assist": 2, "defender cleansheet": 6, "goalkeeper cleansheet": 8, "motm": 3, "totw": 3}
-        }
-        stat_points = div_points[division][stat_type.lower()] * count
-        # Emoji map
-        stat_emojis = {
-            "goal": "⚽",
-            "assist": "🎯",
-            "defender cleansheet": "🛡️",
-            "goalkeeper cleansheet": "🧤",
-            "totw": "📊",
-            "motm": "⭐"
-        }
-        # Compose DM
-        embed = discord.Embed(title="\U0001F441\uFE0F Profile Viewed", color=discord.Color.purple(), timestamp=interaction.created_at)
-        embed.set_author(name=interaction.user.display_name, icon_url=interaction.user.display_avatar.url)
-        embed.add_field(name="\U0001F514 Stat Update Notification", value=f"Your stats in **{division}** have just been updated.", inline=False)
-        embed.add_field(name="\U0001F4F0 Latest change", value=f"{stat_emojis.get(stat_type.lower(), '')} {stat_type.capitalize()}: +{count}  (**+{stat_points} pts**)", inline=False)
-        # Totals
-        embed.add_field(
-            name=f"Your current totals in {division}",
-            value=f"⚽ Goals: {div_stats.get('goal', 0)}\n🎯 Assists: {div_stats.get('assist', 0)}\n🧤 GK Clean Sheets: {div_stats.get('goalkeeper cleansheet', 0)}\n🛡️ Defender Clean Sheets: {div_stats.get('defender cleansheet', 0)}",
-            inline=False
-        )
-        embed.set_footer(text="Use /profile to view your full stat and value changes.")
-        await member.send(embed=embed)
-    except Exception:
-        pass  # Ignore if user has DMs closed
+    notifier.notify(member, StatChange(stat_type.lower(), division, count, interaction.user))
 
 # Remove stat command
 @bot.tree.command(name="removestats", description="Remove a stat from a player for a specific GW/Season")
@@ -492,6 +761,7 @@ async def addstat(
     count="Number of stats to remove",
     division="Division (Div 1, Div 2, or Div 3)"
 )
+@app_commands.autocomplete(stat_type=stat_type_autocomplete)
 async def removestats(
     interaction: discord.Interaction,
     member: discord.Member,
@@ -521,132 +791,560 @@ async def removestats(
         await interaction.response.send_message("❌ Count must be greater than 0")
         return
     
-    async with aiosqlite.connect('vrfs_stats.db') as db:
+    if archive.is_closed(interaction.guild_id, season):
+        await interaction.response.send_message(f"❌ Season {season} is closed and its stats can no longer be changed")
+        return
+    
+    async def remove_stat(conn):
         # Check if the stat exists and get current count
-        async with db.execute('''
+        async with conn.execute('''
             SELECT id, count FROM player_gw_stats
-            WHERE user_id = ? AND gw = ? AND season = ? AND stat_type = ? AND division = ?
+            WHERE guild_id = ? AND user_id = ? AND gw = ? AND season = ? AND stat_type = ? AND division = ?
             ORDER BY id LIMIT 1
-        ''', (member.id, gw, season, stat_type.lower(), division)) as cursor:
+        ''', (interaction.guild_id, member.id, gw, season, STAT_CODES[stat_type.lower()], DIVISION_CODES[division])) as cursor:
             row = await cursor.fetchone()
         if not row:
-            await interaction.response.send_message(f"❌ No stats found for {member.mention} in {division} GW{gw} Season {season}")
-            return
+            return 0
         entry_id, current_count = row
         if count >= current_count:
             # Remove entry
-            await db.execute('DELETE FROM player_gw_stats WHERE id = ?', (entry_id,))
+            await conn.execute('DELETE FROM player_gw_stats WHERE id = ?', (entry_id,))
         else:
             # Subtract count
-            await db.execute('UPDATE player_gw_stats SET count = count - ? WHERE id = ?', (count, entry_id))
-        await db.commit()
+            await conn.execute('UPDATE player_gw_stats SET count = count - ? WHERE id = ?', (count, entry_id))
+        await apply_stat_delta(conn, interaction.guild_id, member.id, stat_type.lower(), division, -min(count, current_count))
+        return min(count, current_count)
+    removed = await writer.submit(remove_stat)
+    if not removed:
+        await interaction.response.send_message(f"❌ No stats found for {member.mention} in {division} GW{gw} Season {season}")
+        return
+    profiles.bump(interaction.guild_id, member.id)
+    team_stats.invalidate(interaction.guild_id)
+    leaderboards.apply(interaction.guild_id, member.id, season, division, stat_type.lower(), -removed)
     
+    await interaction.response.send_message(f"✅ Removed {removed} {stat_type.lower()} from {member.mention} in {division} (GW{gw} Season {season})")
     # DM the user about the stat removal
+    notifier.notify(member, StatChange(stat_type.lower(), division, -removed, interaction.user))
+
+# Bulk add stats command
+@bot.tree.command(name="bulkaddstat", description="Add many stats for the current GW/Season from a CSV or JSON file")
+@app_commands.describe(file="CSV or JSON file with member, stat_type, count and division columns")
+async def bulkaddstat(interaction: discord.Interaction, file: discord.Attachment):
+    if not is_moderator(interaction):
+        await interaction.response.send_message("❌ You don't have permission to use this command")
+        return
+    await interaction.response.defer()
     try:
-        # Get new totals for this division
-        async with aiosqlite.connect('vrfs_stats.db') as db:
-            async with db.execute('''
-                SELECT stat_type, SUM(count) as total
-                FROM player_gw_stats
-                WHERE user_id = ? AND division = ?
-                GROUP BY stat_type
-            ''', (member.id, division)) as cursor:
-                div_stats = {row[0]: row[1] for row in await cursor.fetchall()}
-        # Points for this stat
-        div_points = {
-            "Div 1": {"goal": 9, "assist": 7, "defender cleansheet": 10, "goalkeeper cleansheet": 12, "motm": 8, "totw": 8},
-            "Div 2": {"goal": 6, "assist": 5, "defender cleansheet": 8, "goalkeeper cleansheet": 10, "motm": 6, "totw": 6},
-            "Div 3": {"goal": 3, "assist": 2, "defender cleansheet": 6, "goalkeeper cleansheet": 8, "motm": 3, "totw": 3}
-        }
-        stat_points = div_points[division][stat_type.lower()] * count
-        # Emoji map
-        stat_emojis = {
-            "goal": "⚽",
-            "assist": "🎯",
-            "defender cleansheet": "🛡️",
-            "goalkeeper cleansheet": "🧤",
-            "totw": "📊",
-            "motm": "⭐"
-        }
-        # Compose DM
-        embed = discord.Embed(title="\U0001F514 Stat Update Notification", color=discord.Color.red(), timestamp=interaction.created_at)
-        embed.set_author(name=interaction.user.display_name, icon_url=interaction.user.display_avatar.url)
-        embed.add_field(name="Stat Removed", value=f"Your stats in **{division}** have just been updated.", inline=False)
-        embed.add_field(name="Latest change", value=f"{stat_emojis.get(stat_type.lower(), '')} {stat_type.capitalize()}: -{count}  (**-{stat_points} pts**)", inline=False)
-        # Totals
-        embed.add_field(
-            name=f"Your current totals in {division}",
-            value=f"⚽ Goals: {div_stats.get('goal', 0)}\n🎯 Assists: {div_stats.get('assist', 0)}\n🧤 GK Clean Sheets: {div_stats.get('goalkeeper cleansheet', 0)}\n🛡️ Defender Clean Sheets: {div_stats.get('defender cleansheet', 0)}",
-            inline=False
+        rows = read_rows(file.filename, await file.read())
+    except BulkImportError as e:
+        await interaction.followup.send(f"❌ {e}")
+        return
+    
+    current_gw = config.get_int(interaction.guild_id, 'current_gw')
+    current_season = config.get_int(interaction.guild_id, 'current_season')
+    # Members can be given by ID, mention, username or display name
+    members_by_name = {}
+    for m in interaction.guild.members:
+        members_by_name.setdefault(m.name.lower(), m)
+        members_by_name.setdefault(m.display_name.lower(), m)
+    
+    accepted = []
+    rejected = []
+    for line, row in rows:
+        try:
+            stat_type, count, division = validate_row(row, current_gw, current_season)
+        except ValueError as e:
+            rejected.append(f"Line {line}: {e}")
+            continue
+        ref = str(row.get("member") or "").strip()
+        user_id = ref.strip("<@!>")
+        member = interaction.guild.get_member(int(user_id)) if user_id.isdigit() else members_by_name.get(ref.lower())
+        if member is None:
+            rejected.append(f"Line {line}: member '{echo(ref)}' not found")
+            continue
+        accepted.append((interaction.guild_id, member.id, current_gw, current_season, stat_type, count, division))
+    
+    if accepted:
+        async with db.transaction() as conn:
+            await conn.executemany('''
+                INSERT INTO player_gw_stats (guild_id, user_id, gw, season, stat_type, count, division)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (guild_id, user_id, gw, season, STAT_CODES[stat_type], count, DIVISION_CODES[division])
+                for guild_id, user_id, gw, season, stat_type, count, division in accepted
+            ])
+            await apply_stat_deltas(conn, interaction.guild_id, [(user_id, stat_type, division, count) for _, user_id, _, _, stat_type, count, division in accepted])
+        team_stats.invalidate(interaction.guild_id)
+        for guild_id, user_id, gw, season, stat_type, count, division in accepted:
+            profiles.bump(guild_id, user_id)
+            leaderboards.apply(guild_id, user_id, season, division, stat_type, count)
+            notifier.notify(interaction.guild.get_member(user_id), StatChange(stat_type, division, count, interaction.user))
+    
+    summary = f"✅ Added {len(accepted)} stat row(s) for GW{current_gw} Season {current_season}"
+    if not rejected:
+        await interaction.followup.send(summary)
+        return
+    summary += f"\n❌ Rejected {len(rejected)} row(s):"
+    # List as many rejections as fit in one message; the full list goes in an attachment
+    shown = 0
+    for reason in rejected[:20]:
+        # Leaves room for the "...and N more" line
+        if len(summary) + len(reason) + 60 > MESSAGE_LIMIT:
+            break
+        summary += f"\n{reason}"
+        shown += 1
+    if shown == len(rejected):
+        await interaction.followup.send(summary)
+        return
+    summary += f"\n...and {len(rejected) - shown} more (see the attached file)"
+    report = io.BytesIO("\n".join(rejected).encode("utf-8"))
+    await interaction.followup.send(summary, file=discord.File(report, filename="rejected_rows.txt"))
+
+# Team of the Week command
+@bot.tree.command(name="generatetotw", description="Pick the Team of the Week from the current GW's points")
+@app_commands.describe(
+    division="Division",
+    formation="Formation to fill",
+    award_totw="Also give each picked player a TOTW for this GW"
+)
+async def generatetotw(
+    interaction: discord.Interaction,
+    division: Literal["Div 1", "Div 2", "Div 3"],
+    formation: Literal["4-3-3", "4-4-2", "3-5-2", "3-4-3"] = "4-3-3",
+    award_totw: bool = False
+):
+    if not is_moderator(interaction):
+        await interaction.response.send_message("❌ You don't have permission to use this command")
+        return
+    gw = config.get_int(interaction.guild_id, 'current_gw')
+    season = config.get_int(interaction.guild_id, 'current_season')
+    players = await gameweek_points(db, interaction.guild_id, season, gw, division)
+    lineup = pick_team(players, formation)
+    picked = [user_id for position in lineup.values() for user_id, _ in position]
+    if not picked:
+        await interaction.response.send_message(f"❌ No player with a position scored in {division} GW{gw} Season {season}")
+        return
+    
+    embed = discord.Embed(
+        title=f"⭐ Team of the Week - GW{gw} Season {season}",
+        description=f"{division} - {formation}",
+        color=discord.Color.gold()
+    )
+    # Listed front to back, like a team sheet
+    for position in reversed(list(FORMATIONS[formation])):
+        slots = FORMATIONS[formation][position]
+        names = [f"<@{user_id}> - **{points}** pts" for user_id, points in lineup[position]]
+        names += ["*Unfilled*"] * (slots - len(names))
+        embed.add_field(name=position, value="\n".join(names), inline=False)
+    unpositioned = sum(1 for _, position, _ in players if position not in FORMATIONS[formation])
+    if unpositioned:
+        embed.set_footer(text=f"{unpositioned} scoring player(s) have no position set and weren't considered")
+    
+    if award_totw:
+        async with db.transaction() as conn:
+            awarded = await award(conn, interaction.guild_id, season, gw, division, picked)
+            if awarded:
+                await apply_stat_deltas(conn, interaction.guild_id, [(user_id, "totw", division, 1) for user_id in picked])
+        if not awarded:
+            await interaction.response.send_message(f"⚠️ TOTW was already awarded for {division} GW{gw} Season {season}, so nothing was added.", embed=embed)
+            return
+        team_stats.invalidate(interaction.guild_id)
+        for user_id in picked:
+            profiles.bump(interaction.guild_id, user_id)
+            leaderboards.apply(interaction.guild_id, user_id, season, division, "totw", 1)
+            member = interaction.guild.get_member(user_id)
+            if member:
+                notifier.notify(member, StatChange("totw", division, 1, interaction.user))
+        embed.description += f" - TOTW awarded to {len(picked)} player(s)"
+    await interaction.response.send_message(embed=embed)
+
+# Metrics command
+@bot.tree.command(name="metrics", description="Show command latency and timing breakdown")
+async def metrics_command(interaction: discord.Interaction):
+    if not is_moderator(interaction):
+        await interaction.response.send_message("❌ You don't have permission to use this command")
+        return
+    rows = metrics.summary_rows()
+    table = [f"{'command':<14}{'n':>6}{'err':>4}{'p50':>7}{'p95':>7}{'p99':>7}{'db':>6}{'api':>6}"]
+    for name, count, errors, p50, p95, p99, db_ms, api_ms in rows[:20]:
+        table.append(f"{name[:14]:<14}{count:>6}{errors:>4}{p50:>7.1f}{p95:>7.1f}{p99:>7.1f}{db_ms:>6.1f}{api_ms:>6.1f}")
+    embed = discord.Embed(title="📈 Bot Metrics", description="```\n" + "\n".join(table) + "\n```", color=discord.Color.blue())
+    embed.add_field(name="Event loop lag p99", value=f"{metrics.loop_lag.percentile(99) * 1000:.1f}ms", inline=True)
+    embed.add_field(name="DB query p99", value=f"{metrics.db_queries.percentile(99) * 1000:.1f}ms", inline=True)
+    embed.add_field(name="Slow queries", value=metrics.slow_queries, inline=True)
+    embed.add_field(name="Profile cache", value=f"{profiles.hit_rate() * 100:.0f}% hits, {len(profiles)}/{profiles.max_entries} cached", inline=True)
+    embed.set_footer(text="Times in ms; db/api are per-command averages")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+# Rebuild aggregates command
+@bot.tree.command(name="rebuildstats", description="Recompute every player's totals in this server from the GW stat history")
+async def rebuildstats(interaction: discord.Interaction):
+    if not is_moderator(interaction):
+        await interaction.response.send_message("❌ You don't have permission to use this command")
+        return
+    await interaction.response.defer()
+    async with db.transaction() as conn:
+        players = await rebuild_aggregates(conn, interaction.guild_id)
+    profiles.bump_guild(interaction.guild_id)
+    team_stats.invalidate(interaction.guild_id)
+    await leaderboards.load(db, interaction.guild_id)
+    await interaction.followup.send(f"✅ Rebuilt stat totals for {players} player(s)")
+
+# Set points command (bot owner only, since weights apply to every server)
+@bot.tree.command(name="setpoints", description="Change how many points a stat is worth in a division")
+@app_commands.describe(division="Division", stat_type="Type of stat", points="Points per stat")
+async def setpoints(
+    interaction: discord.Interaction,
+    division: Literal["Div 1", "Div 2", "Div 3"],
+    stat_type: Literal["goal", "assist", "defender cleansheet", "goalkeeper cleansheet", "motm", "totw"],
+    points: int
+):
+    if not await bot.is_owner(interaction.user):
+        await interaction.response.send_message("❌ Only the bot owner can change point values")
+        return
+    if points < 0:
+        await interaction.response.send_message("❌ Points can't be negative")
+        return
+    await interaction.response.defer()
+    
+    async def rebuild_every_guild(conn):
+        async with conn.execute('/* full scan */ SELECT DISTINCT guild_id FROM player_stats') as cursor:
+            guild_ids = [row[0] for row in await cursor.fetchall()]
+        for guild_id in guild_ids:
+            await rebuild_aggregates(conn, guild_id)
+    old = scoring.points(division, stat_type)
+    await scoring.set_points(db, division, stat_type, points, on_write=rebuild_every_guild)
+    profiles.bump_guild()
+    team_stats.invalidate()
+    await leaderboards.load(db)
+    await interaction.followup.send(f"✅ {stat_type.capitalize()} in {division} is now worth {points} points (was {old}). Totals have been recalculated.")
+
+# Close season command
+@bot.tree.command(name="closeseason", description="Close a finished season and archive its GW stat history")
+@app_commands.describe(season="Season to close (1, 2, or 3)")
+async def closeseason(interaction: discord.Interaction, season: int):
+    if not is_moderator(interaction):
+        await interaction.response.send_message("❌ You don't have permission to use this command")
+        return
+    if season not in [1, 2, 3]:
+        await interaction.response.send_message("❌ Season must be 1, 2, or 3")
+        return
+    if archive.is_closed(interaction.guild_id, season):
+        await interaction.response.send_message(f"❌ Season {season} is already closed")
+        return
+    current_season = config.get_int(interaction.guild_id, 'current_season')
+    if season == current_season:
+        await interaction.response.send_message("❌ You can't close the current season. Use /set to move to the next one first.")
+        return
+    if season > current_season:
+        # A closed season can't be reopened, so only seasons that have been played can be closed
+        await interaction.response.send_message(f"❌ Season {season} hasn't been played yet (the current season is {current_season})")
+        return
+    await interaction.response.defer()
+    # Totals and leaderboards don't change; only where the season's history is read from does
+    summaries, raw_rows = await archive.close(interaction.guild_id, season)
+    await interaction.followup.send(f"✅ Closed Season {season}: archived {raw_rows} GW stat row(s) into {summaries} season total(s)")
+
+# Export command
+@bot.tree.command(name="export", description="Download a season's stat history as a compressed CSV or JSON file")
+@app_commands.describe(
+    season="Season to export (leave empty for the current season)",
+    division="Division (leave empty for all divisions)",
+    format="File format"
+)
+async def export(
+    interaction: discord.Interaction,
+    season: int = None,
+    division: Literal["Div 1", "Div 2", "Div 3"] = None,
+    format: Literal["csv", "json"] = "csv"
+):
+    if not is_moderator(interaction):
+        await interaction.response.send_message("❌ You don't have permission to use this command")
+        return
+    if season is None:
+        season = config.get_int(interaction.guild_id, 'current_season')
+    await interaction.response.defer()
+    
+    def member_name(user_id):
+        member = interaction.guild.get_member(user_id)
+        return member.name if member else ""
+    # Closed seasons only exist in the archive they were closed into
+    table = archive.gw_table(interaction.guild_id, season)
+    if not archive.is_readable(table):
+        await interaction.followup.send(f"❌ Season {season} was archived to a separate file that isn't configured (VRFS_ARCHIVE_DB_PATH)")
+        return
+    rows = iter_season_rows(db, interaction.guild_id, season, division, table)
+    file, count, size = await export_season(rows, format, member_name)
+    with file:
+        if count == 0:
+            await interaction.followup.send(f"❌ No stats recorded for Season {season}{f' in {division}' if division else ''}")
+            return
+        if size > interaction.guild.filesize_limit:
+            await interaction.followup.send(f"❌ The export is {size / 1024 / 1024:.1f} MB, over this server's upload limit. Try exporting one division at a time.")
+            return
+        suffix = "-" + division.replace(" ", "").lower() if division else ""
+        filename = f"season{season}{suffix}.{format}.gz"
+        await interaction.followup.send(
+            f"📦 Season {season}{f' {division}' if division else ''}: {count} stat row(s)",
+            file=discord.File(file, filename=filename)
         )
-        embed.set_footer(text="Use /profile to view your full stat and value changes.")
-        await member.send(embed=embed)
-    except Exception:
-        pass  # Ignore if user has DMs closed
 
-# --- Transfer Confirmation View ---
-class TransferConfirmView(discord.ui.View):
-    def __init__(self, member: discord.Member, team: discord.Role, fee: int, moderator: discord.Member, interaction: discord.Interaction, additional_info: str = None):
-        super().__init__(timeout=180)
-        self.member = member
-        self.team = team
-        self.fee = fee
-        self.moderator = moderator
+# --- Leaderboard View ---
+class LeaderboardView(discord.ui.View):
+    def __init__(self, guild_id: int, season: int, division: str, metric: str):
+        super().__init__(timeout=120)
+        self.guild_id = guild_id
+        self.season = season
+        self.division = division
+        self.metric = metric
+        self.page = 0
+
+    def render(self) -> discord.Embed:
+        entries, page_count = leaderboards.page(self.guild_id, self.season, self.division, self.metric, self.page)
+        scope = f"{self.division or 'All divisions'} - {f'Season {self.season}' if self.season else 'All seasons'}"
+        title = "Points" if self.metric == "points" else self.metric.capitalize()
+        embed = discord.Embed(title=f"🏆 {title} Leaderboard", description=scope, color=discord.Color.gold())
+        if entries:
+            start = self.page * 25
+            embed.add_field(
+                name="Standings",
+                value="\n".join(f"`#{start + i + 1}` <@{user_id}> - **{score}**" for i, (user_id, score) in enumerate(entries)),
+                inline=False
+            )
+        else:
+            embed.add_field(name="Standings", value="No stats recorded yet.", inline=False)
+        embed.set_footer(text=f"Page {self.page + 1}/{max(page_count, 1)}")
+        self.previous.disabled = self.page == 0
+        self.next.disabled = self.page + 1 >= page_count
+        return embed
+
+    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(self.page - 1, 0)
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+# Leaderboard command
+@bot.tree.command(name="leaderboard", description="View the top players by points or stat")
+@app_commands.describe(
+    metric="What to rank by",
+    division="Division (leave empty for all divisions)",
+    season="Season (leave empty for all seasons)"
+)
+@app_commands.guild_only()
+async def leaderboard(
+    interaction: discord.Interaction,
+    metric: Literal["points", "goal", "assist", "defender cleansheet", "goalkeeper cleansheet", "motm", "totw"] = "points",
+    division: Literal["Div 1", "Div 2", "Div 3"] = None,
+    season: int = None
+):
+    view = LeaderboardView(interaction.guild_id, season, division, metric)
+    await interaction.response.send_message(embed=view.render(), view=view)
+
+# --- History View ---
+class HistoryView(discord.ui.View):
+    def __init__(self, interaction: discord.Interaction, member: discord.Member, season: int, table: str = "player_gw_stats"):
+        super().__init__(timeout=120)
         self.interaction = interaction
-        self.additional_info = additional_info
-        self.value = None
-
-    @discord.ui.button(label="Agree", style=discord.ButtonStyle.success)
-    async def agree(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.member.add_roles(self.team)
-        await interaction.response.send_message(f"You have agreed to transfer to {self.team.name}!", ephemeral=True)
-        await self.interaction.followup.send(f"✅ {self.member.mention} has agreed to transfer to {self.team.mention} for £{self.fee}.")
-        self.value = True
-        self.stop()
-
-    @discord.ui.button(label="Disagree", style=discord.ButtonStyle.danger)
-    async def disagree(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.send_message("You have declined the transfer.", ephemeral=True)
-        await self.interaction.followup.send(f"❌ {self.member.mention} has declined the transfer to {self.team.mention}.")
-        self.value = False
-        self.stop()
-
-# --- Loan Confirmation View ---
-class LoanConfirmView(discord.ui.View):
-    def __init__(self, member: discord.Member, team: discord.Role, gws: int, release_clause: str, recall_option: str, moderator: discord.Member, interaction: discord.Interaction, additional_info: str = None):
-        super().__init__(timeout=180)
         self.member = member
-        self.team = team
-        self.gws = gws
-        self.release_clause = release_clause
-        self.recall_option = recall_option
-        self.moderator = moderator
-        self.interaction = interaction
-        self.additional_info = additional_info
-        self.value = None
-
-    @discord.ui.button(label="Agree", style=discord.ButtonStyle.success)
-    async def agree(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.member.add_roles(self.team)
-        await interaction.response.send_message(f"You have agreed to join {self.team.name} on loan!", ephemeral=True)
-        await self.interaction.followup.send(f"✅ {self.member.mention} has agreed to a loan to {self.team.mention} for {self.gws} GWs. Recall: {self.recall_option.capitalize()}.")
-        self.value = True
-        self.stop()
-
-    @discord.ui.button(label="Disagree", style=discord.ButtonStyle.danger)
-    async def disagree(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.send_message("You have declined the loan.", ephemeral=True)
-        await self.interaction.followup.send(f"❌ {self.member.mention} has declined the loan to {self.team.mention}.")
-        self.value = False
-        self.stop()
+        self.season = season
+        self.table = table
+        self.points = 0
+        # (gw, id) cursor each page up to the current one starts after; only the current page's rows are kept
+        self.cursors = [(0, 0)]
+        self.rows = []
+        self.has_next = False
+
+    async def load(self):
+        # One extra row says whether there is a next page without counting the rest
+        rows = await fetch_page(db, self.interaction.guild_id, self.member.id, self.season, self.cursors[-1], self.table, PER_PAGE + 1)
+        self.has_next = len(rows) > PER_PAGE
+        self.rows = rows[:PER_PAGE]
+
+    def render(self) -> discord.Embed:
+        embed = discord.Embed(title=f"📅 {self.member.display_name} - Season {self.season}", color=discord.Color.gold())
+        lines = []
+        for _, gw, division_code, stat_code, count in self.rows:
+            division = DIVISION_NAMES.get(division_code)
+            stat_type = STAT_NAMES.get(stat_code)
+            points = scoring.points(division, stat_type) * count if division and stat_type else 0
+            lines.append(f"`GW {gw}` {division or '?'} - {(stat_type or 'unknown stat').capitalize()} x{count} - **{points}** pts")
+        embed.add_field(name="Gameweeks", value="\n".join(lines) or "No stats recorded yet.", inline=False)
+        embed.set_footer(text=f"Page {len(self.cursors)} - {self.points} points this season")
+        self.previous.disabled = len(self.cursors) == 1
+        self.next.disabled = not self.has_next
+        return embed
+
+    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+        await self.load()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.has_next:
+            entry_id, gw = self.rows[-1][:2]
+            self.cursors.append((gw, entry_id))
+        await self.load()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    async def on_timeout(self):
+        # Drop the page state and the interaction so an expired pager holds nothing
+        interaction = self.interaction
+        self.interaction = None
+        self.cursors = []
+        self.rows = []
+        for item in self.children:
+            item.disabled = True
+        try:
+            await interaction.edit_original_response(view=self)
+        except discord.HTTPException:
+            pass
+        self.clear_items()
+
+# History command
+@bot.tree.command(name="history", description="View a player's GW-by-GW stats and points for a season")
+@app_commands.describe(
+    member="Player to view (leave empty for yourself)",
+    season="Season (leave empty for the current season)"
+)
+@app_commands.guild_only()
+async def history(interaction: discord.Interaction, member: discord.Member = None, season: int = None):
+    if member is None:
+        member = interaction.user
+    if season is None:
+        season = config.get_int(interaction.guild_id, 'current_season')
+    # Closed seasons only exist in the archive they were closed into
+    table = archive.gw_table(interaction.guild_id, season)
+    if not archive.is_readable(table):
+        await interaction.response.send_message(f"❌ Season {season} was archived to a separate file that isn't configured (VRFS_ARCHIVE_DB_PATH)")
+        return
+    closed = archive.is_closed(interaction.guild_id, season)
+    view = HistoryView(interaction, member, season, table)
+    await view.load()
+    if not view.rows:
+        await interaction.response.send_message(f"❌ {member.display_name} has no stats recorded in Season {season}")
+        return
+    view.points = await season_points(db, interaction.guild_id, member.id, season, closed)
+    await interaction.response.send_message(embed=view.render(), view=view)
+
+# --- Offer buttons ---
+# kind -> (agreed reply, agreed announcement, declined reply, declined announcement)
+OFFER_MESSAGES = {
+    "sign": (
+        "You have agreed to join {team_name}!",
+        "✅ {member} has agreed to join {team}.",
+        "You have declined the signing.",
+        "❌ {member} has declined the signing to {team}."
+    ),
+    "transfer": (
+        "You have agreed to transfer to {team_name}!",
+        "✅ {member} has agreed to transfer to {team} for £{fee}.",
+        "You have declined the transfer.",
+        "❌ {member} has declined the transfer to {team}."
+    ),
+    "loan": (
+        "You have agreed to join {team_name} on loan!",
+        "✅ {member} has agreed to a loan to {team} for {gws} GWs. Recall: {recall}.",
+        "You have declined the loan.",
+        "❌ {member} has declined the loan to {team}."
+    ),
+}
+
+# One registered class answers every offer; the custom_id carries the offer id, so no view lives per offer
+class OfferButton(discord.ui.DynamicItem[discord.ui.Button], template=r"offer:(?P<id>[0-9]+):(?P<action>[ad])"):
+    def __init__(self, offer_id: int, action: str):
+        super().__init__(discord.ui.Button(
+            label="Agree" if action == "a" else "Disagree",
+            style=discord.ButtonStyle.success if action == "a" else discord.ButtonStyle.danger,
+            custom_id=f"offer:{offer_id}:{action}"
+        ))
+        self.offer_id = offer_id
+        self.action = action
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["id"]), match["action"])
+
+    async def callback(self, interaction: discord.Interaction):
+        offer = await offers.claim(self.offer_id)
+        if offer is None:
+            await interaction.response.edit_message(view=None)
+            await interaction.followup.send("⌛ This offer has expired or was already answered.")
+            return
+        guild = bot.get_guild(offer.guild_id)
+        team = guild.get_role(offer.team_role_id) if guild else None
+        if team is None:
+            await interaction.response.edit_message(view=None)
+            await interaction.followup.send("❌ This team no longer exists, so the offer was withdrawn.")
+            return
+        agreed = self.action == "a"
+        if agreed:
+            try:
+                member = guild.get_member(offer.user_id) or await guild.fetch_member(offer.user_id)
+                await member.add_roles(team)
+            except discord.NotFound:
+                await interaction.response.edit_message(view=None)
+                await interaction.followup.send("❌ You're no longer in the server, so the offer was withdrawn.")
+                return
+            except discord.HTTPException:
+                # Most likely the team role is above the bot's; the offer stays open so it can be accepted once that's fixed
+                await offers.restore(offer)
+                await interaction.response.send_message(f"❌ I couldn't give you the {team.name} role. Ask a moderator to check my permissions, then try again.")
+                return
+        reply, announcement = OFFER_MESSAGES[offer.kind][0:2] if agreed else OFFER_MESSAGES[offer.kind][2:4]
+        await interaction.response.edit_message(view=None)
+        await interaction.followup.send(reply.format(team_name=team.name))
+        if offer.channel_id:
+            await bot.get_partial_messageable(offer.channel_id).send(announcement.format(
+                member=f"<@{offer.user_id}>",
+                team=team.mention,
+                fee=offer.details.get("fee"),
+                gws=offer.details.get("gws"),
+                recall=str(offer.details.get("recall_option", "")).capitalize()
+            ))
+
+# DM an offer with its Agree/Disagree buttons; returns False if the player can't be DMed
+async def send_offer(interaction: discord.Interaction, member: discord.Member, team: discord.Role, kind: str, embed: discord.Embed, **details) -> bool:
+    offer_id = await offers.create(kind, interaction.guild_id, member.id, team.id, interaction.user.id, interaction.channel_id, details)
+    view = discord.ui.View(timeout=None)
+    view.add_item(OfferButton(offer_id, "a"))
+    view.add_item(OfferButton(offer_id, "d"))
+    try:
+        message = await member.send(embed=embed, view=view)
+    except Exception:
+        await offers.cancel(offer_id)
+        return False
+    await offers.attach_message(offer_id, message.channel.id, message.id)
+    return True
+
+# Called by the offer store once an offer's time is up; takes the buttons off its DM
+async def expire_offer(offer):
+    if offer.message_id is None:
+        return
+    try:
+        await bot.get_partial_messageable(offer.dm_channel_id).get_partial_message(offer.message_id).edit(view=None)
+    except discord.HTTPException:
+        pass
 
 # --- /transfer command ---
 @bot.tree.command(name="transfer", description="Transfer a user to a team (with confirmation)")
-@app_commands.describe(member="Player to transfer", team="Team role to assign", fee="Transfer fee", additional_info="Additional info (optional)")
-async def transfer(interaction: discord.Interaction, member: discord.Member, team: discord.Role, fee: int, additional_info: str = None):
+@app_commands.describe(member="Player to transfer", team="Registered team to transfer them to", fee="Transfer fee", additional_info="Additional info (optional)")
+@app_commands.autocomplete(team=team_autocomplete)
+async def transfer(interaction: discord.Interaction, member: discord.Member, team: str, fee: int, additional_info: str = None):
     if not is_moderator(interaction):
         await interaction.response.send_message("❌ You don't have permission to use this command")
         return
+    team = resolve_team(interaction.guild, team)
+    if team is None:
+        await interaction.response.send_message("❌ That isn't a registered team. Pick one from the suggestions.")
+        return
     embed = discord.Embed(title="VFA.GG Transactions", description=f"**Transfer Offer**\n{team.name} have submitted a transfer offer for {member.mention}.", color=discord.Color.green())
     embed.set_author(name="NOVA", icon_url=bot.user.display_avatar.url)
     embed.add_field(name="Player", value=member.mention, inline=False)
@@ -656,20 +1354,23 @@ async def transfer(interaction: discord.Interaction, member: discord.Member, tea
         embed.add_field(name="Additional Info", value=additional_info, inline=False)
     else:
         embed.add_field(name="Additional Info", value="Use the buttons below to accept or decline.", inline=False)
-    view = TransferConfirmView(member, team, fee, interaction.user, interaction, additional_info)
-    try:
-        await member.send(embed=embed, view=view)
+    if await send_offer(interaction, member, team, "transfer", embed, fee=fee):
         await interaction.response.send_message(f"Sent transfer confirmation to {member.mention}.")
-    except Exception:
+    else:
         await interaction.response.send_message(f"❌ Could not DM {member.mention}. They may have DMs closed.")
 
 # --- /loan command ---
 @bot.tree.command(name="loan", description="Loan a user to a team (with confirmation)")
-@app_commands.describe(member="Player to loan", team="Team role to assign", gws="Loan duration in GWs (1-22)", release_clause="Release clause (yes/no)", recall_option="Recall option (yes/no)", additional_info="Additional info (optional)")
-async def loan(interaction: discord.Interaction, member: discord.Member, team: discord.Role, gws: int, release_clause: str, recall_option: str, additional_info: str = None):
+@app_commands.describe(member="Player to loan", team="Registered team to loan them to", gws="Loan duration in GWs (1-22)", release_clause="Release clause (yes/no)", recall_option="Recall option (yes/no)", additional_info="Additional info (optional)")
+@app_commands.autocomplete(team=team_autocomplete)
+async def loan(interaction: discord.Interaction, member: discord.Member, team: str, gws: int, release_clause: str, recall_option: str, additional_info: str = None):
     if not is_moderator(interaction):
         await interaction.response.send_message("❌ You don't have permission to use this command")
         return
+    team = resolve_team(interaction.guild, team)
+    if team is None:
+        await interaction.response.send_message("❌ That isn't a registered team. Pick one from the suggestions.")
+        return
     if not 1 <= gws <= 22:
         await interaction.response.send_message("❌ Loan duration must be between 1 and 22 GWs.")
         return
@@ -687,11 +1388,9 @@ async def loan(interaction: discord.Interaction, member: discord.Member, team: d
         embed.add_field(name="Additional Info", value=additional_info, inline=False)
     else:
         embed.add_field(name="Additional Info", value="Use the buttons below to accept or decline.", inline=False)
-    view = LoanConfirmView(member, team, gws, release_clause, recall_option, interaction.user, interaction, additional_info)
-    try:
-        await member.send(embed=embed, view=view)
+    if await send_offer(interaction, member, team, "loan", embed, gws=gws, recall_option=recall_option):
         await interaction.response.send_message(f"Sent loan confirmation to {member.mention}.")
-    except Exception:
+    else:
         await interaction.response.send_message(f"❌ Could not DM {member.mention}. They may have DMs closed.")
 
 # Add team command
@@ -702,17 +1401,18 @@ async def addteam(interaction: discord.Interaction, team_name: str, division: Li
         await interaction.response.send_message("❌ You don't have permission to use this command")
         return
     guild = interaction.guild
-    # Check if role exists
-    if discord.utils.get(guild.roles, name=team_name):
+    # Check if the team exists
+    if teams.is_registered(guild.id, team_name):
         await interaction.response.send_message(f"❌ Team '{team_name}' already exists.")
         return
+    # A second role with the same name would be ambiguous when teams are matched to roles by name
+    if teams.role_name_taken(guild.id, team_name):
+        await interaction.response.send_message(f"❌ A role named '{team_name}' already exists. Pick another name or delete that role first.")
+        return
     # Check division team count
-    async with aiosqlite.connect('vrfs_stats.db') as db:
-        async with db.execute('SELECT COUNT(*) FROM teams WHERE division = ?', (division,)) as cursor:
-            count = (await cursor.fetchone())[0]
-        if count >= 10:
-            await interaction.response.send_message(f"❌ {division} already has 10 teams.")
-            return
+    if teams.count(guild.id, division) >= 10:
+        await interaction.response.send_message(f"❌ {division} already has 10 teams.")
+        return
     # Parse color
     role_color = discord.Color.default()
     if color:
@@ -725,11 +1425,13 @@ async def addteam(interaction: discord.Interaction, team_name: str, division: Li
             await interaction.response.send_message("❌ Invalid color. Use hex (e.g. #ff0000) or a Discord color name.")
             return
     # Create role
-    await guild.create_role(name=team_name, color=role_color)
+    role = await guild.create_role(name=team_name, color=role_color)
     # Add to teams table
-    async with aiosqlite.connect('vrfs_stats.db') as db:
-        await db.execute('INSERT INTO teams (team_name, division) VALUES (?, ?)', (team_name, division))
-        await db.commit()
+    async def insert_team(conn):
+        await conn.execute('INSERT INTO teams (guild_id, team_name, division, role_id) VALUES (?, ?, ?, ?)', (guild.id, team_name, division, role.id))
+    await writer.submit(insert_team)
+    teams.add(guild.id, team_name, division, role.id)
     await interaction.response.send_message(f"✅ Team '{team_name}' created in {division}.")
 
-bot.run(TOKEN)
+if __name__ == "__main__":
+    bot.run(TOKEN)
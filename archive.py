@@ -0,0 +1,95 @@
+"""Season close: compact a finished season's raw GW rows into summaries.
+
+Closing a season writes one ``season_stats`` row per (player, season,
+division, stat type), then moves the season's ``player_gw_stats`` rows out of
+the live table. They go to the attached archive database file when
+``VRFS_ARCHIVE_DB_PATH`` is set, and to ``player_gw_stats_archive`` otherwise.
+The table used is stored with the closed season, so its rows are still found
+if the archive file is configured or removed later.
+
+SQLite doesn't commit atomically across attached WAL databases, so a close
+commits twice: first the copy into the archive table, then, in the main file
+alone, the summaries, the delete from the live table and the closed_seasons
+row. If the process stops in between, the season is simply still open, and
+closing it again replaces the copied rows. Archived rows are only read for
+closed seasons, so readers never see a season counted twice. From then on,
+history is read from the summaries and ``player_gw_stats`` only holds
+seasons that are still open.
+"""
+from database import Database
+
+ARCHIVE_COLUMNS = "id, guild_id, user_id, gw, season, stat_type, count, division"
+# Every table GW rows can be read from
+GW_TABLES = ("player_gw_stats", "player_gw_stats_archive", "archive.player_gw_stats")
+
+
+class SeasonArchive:
+    def __init__(self, database: Database):
+        self.db = database
+        # guild_id -> {closed season: table holding its raw rows}
+        self._closed = {}
+
+    async def load(self):
+        rows = await self.db.fetchall('/* full scan */ SELECT guild_id, season, archive_table FROM closed_seasons')
+        self._closed = {}
+        for guild_id, season, table in rows:
+            self._closed.setdefault(guild_id, {})[season] = table
+
+    def is_closed(self, guild_id: int, season: int) -> bool:
+        return season in self._closed.get(guild_id, ())
+
+    def gw_table(self, guild_id: int, season: int) -> str:
+        """The table holding the season's GW rows: the live table, or the archive it was closed into."""
+        return self._closed.get(guild_id, {}).get(season, "player_gw_stats")
+
+    def is_readable(self, table: str) -> bool:
+        """False for seasons archived to a file that is no longer attached."""
+        return not table.startswith("archive.") or bool(self.db.archive_path)
+
+    async def close(self, guild_id: int, season: int) -> tuple:
+        """Compact and archive one season; return ``(summary_rows, raw_rows)``."""
+        table = "archive.player_gw_stats" if self.db.archive_path else "player_gw_stats_archive"
+        async with self.db.transaction() as conn:
+            # First commit: copy the rows into the archive table
+            if self.db.archive_path:
+                await conn.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        id INTEGER PRIMARY KEY,
+                        guild_id INTEGER NOT NULL,
+                        user_id INTEGER,
+                        gw INTEGER,
+                        season INTEGER,
+                        stat_type INTEGER,
+                        count INTEGER,
+                        division INTEGER
+                    )
+                ''')
+                await conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_gw_archive_season ON player_gw_stats (guild_id, season)')
+                await conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_gw_archive_history ON player_gw_stats (guild_id, user_id, season, gw)')
+            # Left over from a close that stopped between the two commits
+            await conn.execute(f'DELETE FROM {table} WHERE guild_id = ? AND season = ?', (guild_id, season))
+            await conn.execute(f'''
+                INSERT OR IGNORE INTO {table} ({ARCHIVE_COLUMNS})
+                SELECT {ARCHIVE_COLUMNS} FROM player_gw_stats
+                WHERE guild_id = ? AND season = ?
+            ''', (guild_id, season))
+            # The writer lock is held across both commits, so no other write lands in between
+            await conn.commit()
+            # Second commit: everything below only touches the main file, so it commits atomically
+            await conn.execute('''
+                INSERT INTO season_stats (guild_id, user_id, season, division, stat_type, count)
+                SELECT guild_id, user_id, season, division, stat_type, SUM(count)
+                FROM player_gw_stats
+                WHERE guild_id = ? AND season = ?
+                GROUP BY guild_id, user_id, season, division, stat_type
+            ''', (guild_id, season))
+            async with conn.execute('DELETE FROM player_gw_stats WHERE guild_id = ? AND season = ?', (guild_id, season)) as cursor:
+                raw_rows = cursor.rowcount
+            async with conn.execute('SELECT COUNT(*) FROM season_stats WHERE guild_id = ? AND season = ?', (guild_id, season)) as cursor:
+                summaries = (await cursor.fetchone())[0]
+            await conn.execute(
+                'INSERT INTO closed_seasons (guild_id, season, raw_rows, archive_table) VALUES (?, ?, ?, ?)',
+                (guild_id, season, raw_rows, table)
+            )
+        self._closed.setdefault(guild_id, {})[season] = table
+        return summaries, raw_rows
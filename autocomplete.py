@@ -0,0 +1,58 @@
+"""In-memory prefix indexes behind the slash command autocomplete handlers.
+
+Discord drops autocomplete answers that take longer than 3 seconds, so
+suggestions never touch the database. Stat types are fixed; team names
+are indexed per guild by :class:`team_registry.TeamRegistry`.
+"""
+import bisect
+
+# Discord shows at most 25 choices
+MAX_CHOICES = 25
+
+
+class PrefixIndex:
+    """Case-insensitive lookup of names by the start of any word in them."""
+
+    def __init__(self, names=()):
+        # (lowercased name from a word start onward, name), sorted
+        self._keys = []
+        self._names = set()
+        for name in names:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @staticmethod
+    def _suffixes(name: str):
+        lowered = name.lower()
+        for i, char in enumerate(lowered):
+            if i == 0 or (lowered[i - 1] == " " and char != " "):
+                yield lowered[i:]
+
+    def add(self, name: str):
+        if name in self._names:
+            return
+        self._names.add(name)
+        for suffix in self._suffixes(name):
+            bisect.insort(self._keys, (suffix, name))
+
+    def remove(self, name: str):
+        if name not in self._names:
+            return
+        self._names.discard(name)
+        for suffix in self._suffixes(name):
+            del self._keys[bisect.bisect_left(self._keys, (suffix, name))]
+
+    def search(self, query: str, limit: int = MAX_CHOICES) -> list:
+        """Names with a word starting with ``query``; whole-name prefix matches first."""
+        query = query.strip().lower()
+        if not query:
+            return sorted(self._names, key=str.lower)[:limit]
+        matches = set()
+        i = bisect.bisect_left(self._keys, (query,))
+        while i < len(self._keys) and self._keys[i][0].startswith(query):
+            matches.add(self._keys[i][1])
+            i += 1
+        return sorted(matches, key=lambda name: (not name.lower().startswith(query), name.lower()))[:limit]
+
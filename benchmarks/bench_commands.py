@@ -0,0 +1,300 @@
+"""Offline load benchmark for the bot's slash commands.
+
+Seeds a temporary SQLite database with a synthetic league, then calls the
+command callbacks from Main.py directly with stand-in Discord objects under
+concurrent load and reports latency percentiles and throughput.
+
+    python -m benchmarks.bench_commands --players 2000 --seasons 5 --requests 2000
+    python -m benchmarks.bench_commands --json > bench.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import Main  # noqa: E402
+from benchmarks.fakes import FakeGuild, FakeInteraction, FakeMember  # noqa: E402
+from migrations import migrate  # noqa: E402
+from stats import DIVISION_CODES, POSITIONS, STAT_CODES, STAT_COLUMNS, rebuild_aggregates  # noqa: E402
+
+DEFAULT_MIX = "profile=50,leaderboard=20,addstat=20,removestats=8,addteam=2"
+
+
+class League:
+    """The synthetic guild, its members and the seeded GW rows."""
+
+    def __init__(self, args):
+        self.rng = random.Random(args.seed)
+        self.args = args
+        self.guild = FakeGuild()
+        self.moderator = FakeMember(self.guild, name="benchmark-mod", administrator=True)
+        self.guild.add_member(self.moderator)
+        self.divisions = list(DIVISION_CODES)[:args.divisions]
+        self.players = []
+        self.player_division = {}
+        self.current_gw = 1
+        self.current_season = min(args.seasons, 3)
+
+    async def seed(self):
+        args = self.args
+        teams = [(f"Team {i + 1}", self.divisions[i % len(self.divisions)]) for i in range(args.teams)]
+        for i in range(args.players):
+            member = FakeMember(self.guild)
+            self.guild.add_member(member)
+            self.players.append(member)
+            self.player_division[member.id] = teams[i % len(teams)][1]
+
+        stat_types = list(STAT_COLUMNS)
+        rows = []
+        for season in range(1, args.seasons + 1):
+            for gw in range(1, args.gws + 1):
+                for member in self.players:
+                    if self.rng.random() < args.stat_rate:
+                        rows.append((
+                            self.guild.id, member.id, gw, season, STAT_CODES[self.rng.choice(stat_types)],
+                            self.rng.randint(1, 2), DIVISION_CODES[self.player_division[member.id]]
+                        ))
+
+        async with Main.db.transaction() as conn:
+            await conn.executemany('INSERT INTO teams (guild_id, team_name, division) VALUES (?, ?, ?)', [(self.guild.id, *team) for team in teams])
+            await conn.executemany('''
+                INSERT INTO player_gw_stats (guild_id, user_id, gw, season, stat_type, count, division)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            await rebuild_aggregates(conn, self.guild.id)
+            await conn.executemany(
+                'UPDATE player_stats SET position = ? WHERE guild_id = ? AND user_id = ?',
+                [(self.rng.choice(POSITIONS), self.guild.id, member.id) for member in self.players]
+            )
+            await conn.executemany(
+                'INSERT INTO config (guild_id, key, value) VALUES (?, ?, ?) ON CONFLICT(guild_id, key) DO UPDATE SET value = excluded.value',
+                [(self.guild.id, 'current_gw', str(self.current_gw)), (self.guild.id, 'current_season', str(self.current_season))]
+            )
+        for name, _ in teams:
+            await self.guild.create_role(name)
+        return len(rows)
+
+    def interaction(self):
+        return FakeInteraction(self.moderator, self.guild)
+
+    def player(self):
+        return self.rng.choice(self.players)
+
+    def check(self, interaction):
+        """Raise if the command answered with an error, so a rejection isn't timed as a success."""
+        replies = interaction.response.messages + interaction.followup.messages
+        if replies and isinstance(replies[-1], str) and replies[-1].startswith("❌"):
+            raise RuntimeError(replies[-1])
+
+    async def remove_team(self, team_name: str):
+        # Keeps every division under the 10-team cap, so each addteam call really creates a team
+        team = Main.teams.remove(self.guild.id, team_name)
+        async def delete(conn):
+            await conn.execute('DELETE FROM teams WHERE guild_id = ? AND team_name = ?', (self.guild.id, team_name))
+        await Main.writer.submit(delete)
+        self.guild.roles = [role for role in self.guild.roles if role.id != team.role_id]
+
+    # --- Scenarios: each awaits one command callback and may return an untimed cleanup ---
+
+    async def profile(self):
+        interaction = self.interaction()
+        await Main.profile.callback(interaction, self.player())
+        self.check(interaction)
+
+    async def leaderboard(self):
+        metric = self.rng.choice(["points"] + list(STAT_COLUMNS))
+        division = self.rng.choice(self.divisions + [None])
+        season = self.rng.choice([None, self.current_season])
+        interaction = self.interaction()
+        await Main.leaderboard.callback(interaction, metric, division, season)
+        self.check(interaction)
+
+    async def addstat(self):
+        member = self.player()
+        interaction = self.interaction()
+        await Main.addstat.callback(
+            interaction, member, self.current_gw, self.current_season,
+            self.rng.choice(list(STAT_COLUMNS)), 1, self.player_division[member.id]
+        )
+        self.check(interaction)
+
+    async def removestats(self):
+        # Not checked: a random GW often has nothing of that stat to remove
+        member = self.player()
+        await Main.removestats.callback(
+            self.interaction(), member, self.rng.randint(1, self.args.gws), self.current_season,
+            self.rng.choice(list(STAT_COLUMNS)), 1, self.player_division[member.id]
+        )
+
+    async def addteam(self):
+        team_name = f"Bench FC {self.rng.random():.12f}"
+        interaction = self.interaction()
+        await Main.addteam.callback(interaction, team_name, self.rng.choice(self.divisions), None)
+        self.check(interaction)
+        return lambda: self.remove_team(team_name)
+
+    async def generatetotw(self):
+        interaction = self.interaction()
+        await Main.generatetotw.callback(interaction, self.rng.choice(self.divisions), "4-3-3", False)
+        self.check(interaction)
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.fmean(values), 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0,
+        "throughput_per_s": round(len(values) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def run_load(league: League, mix: dict, requests: int, concurrency: int) -> dict:
+    names = list(mix)
+    plan = league.rng.choices(names, weights=[mix[n] for n in names], k=requests)
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    queue = iter(plan)
+
+    async def worker():
+        for name in queue:
+            scenario = getattr(league, name)
+            start = time.perf_counter()
+            try:
+                cleanup = await scenario()
+            except Exception as e:
+                if not errors[name]:
+                    print(f"First error in {name}: {e!r}")
+                errors[name] += 1
+                continue
+            latencies[name].append((time.perf_counter() - start) * 1000)
+            if cleanup is not None:
+                await cleanup()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    results = {name: summarize(values, elapsed) for name, values in latencies.items()}
+    for name in names:
+        results[name]["errors"] = errors[name]
+    results["all"] = summarize([v for values in latencies.values() for v in values], elapsed)
+    results["all"]["errors"] = sum(errors.values())
+    results["all"]["elapsed_s"] = round(elapsed, 3)
+    return results
+
+
+async def main_async(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        Main.db.path = os.path.join(tmp, "bench.db")
+        Main.METRICS_PATH = os.path.join(tmp, "metrics.prom")
+        league = League(args)
+        # Commands render the bot's own avatar into embeds
+        Main.bot._connection.user = FakeMember(league.guild, name="NOVA")
+
+        seed_start = time.perf_counter()
+        await Main.db.connect()
+        await migrate(Main.db)
+        rows = await league.seed()
+        seed_time = time.perf_counter() - seed_start
+
+        startup_start = time.perf_counter()
+        await Main.bot.setup_hook()
+        await Main.on_guild_available(league.guild)
+        startup_time = time.perf_counter() - startup_start
+
+        try:
+            mix = parse_mix(args.mix)
+            unknown = [name for name in mix if not hasattr(League, name)]
+            if unknown:
+                raise SystemExit(f"Unknown scenario(s): {', '.join(unknown)}")
+            if args.warmup:
+                await run_load(league, mix, args.warmup, args.concurrency)
+            results = await run_load(league, mix, args.requests, args.concurrency)
+        finally:
+            await Main.metrics.stop()
+            await Main.notifier.stop()
+            await Main.offers.stop()
+            await Main.role_jobs.stop()
+            await Main.writer.stop()
+            await Main.db.close()
+
+    return {
+        "config": {
+            "divisions": len(league.divisions), "teams": args.teams, "players": args.players,
+            "seasons": args.seasons, "gws": args.gws, "gw_rows": rows, "requests": args.requests,
+            "concurrency": args.concurrency, "mix": args.mix, "seed": args.seed,
+        },
+        "seed_s": round(seed_time, 3),
+        "startup_s": round(startup_time, 3),
+        "commands": results,
+    }
+
+
+def print_report(report: dict):
+    config = report["config"]
+    print(f"League: {config['divisions']} divisions, {config['teams']} teams, {config['players']} players, "
+          f"{config['seasons']} seasons x {config['gws']} GWs ({config['gw_rows']} GW rows)")
+    print(f"Seeded in {report['seed_s']}s, setup_hook took {report['startup_s']}s")
+    print(f"{config['requests']} requests at concurrency {config['concurrency']}\n")
+    print(f"{'command':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'ops/s':>10}{'errors':>8}")
+    for name, stats in report["commands"].items():
+        print(f"{name:<14}{stats['count']:>7}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+              f"{stats['max_ms']:>10}{stats['throughput_per_s']:>10}{stats['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--divisions", type=int, default=3, choices=[1, 2, 3])
+    # Below the 10-per-division cap, so addteam has room
+    parser.add_argument("--teams", type=int, default=24)
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--seasons", type=int, default=5)
+    parser.add_argument("--gws", type=int, default=22)
+    parser.add_argument("--stat-rate", type=float, default=0.5, help="chance a player logs a stat in a GW")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted scenarios, e.g. profile=50,addstat=20")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    # Keep the bot's own log output off stdout so --json stays parseable
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Before/after benchmark for the integer-coded stats schema (migration 7).
+
+Builds a synthetic league at schema version 6, where stat types and
+divisions are stored as strings. It closes every season but the last, so
+season_stats is populated too. It then copies the file and migrates the copy
+to the latest version. Both files are vacuumed, then the script reports
+on-disk bytes per table and index, and the median time of the hot stats
+queries on each.
+
+    python -m benchmarks.bench_schema --players 5000 --seasons 5
+    python -m benchmarks.bench_schema --json > schema.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import migrations  # noqa: E402
+from database import Database  # noqa: E402
+from stats import DIVISION_CODES, STAT_CODES  # noqa: E402
+
+GUILD_ID = 1
+# Columns shared by player_gw_stats and its archive at schema version 6
+V6_GW_COLUMNS = "id, guild_id, user_id, gw, season, stat_type, count, division"
+OBJECTS = ["player_gw_stats", "idx_gw_stats_user_division", "idx_gw_stats_entry", "season_stats"]
+
+# name -> (sql, params(rng, encoding, league) -> tuple); the SQL is the same on both schemas, only the values differ
+QUERIES = {
+    "leaderboard_load": ('''
+        SELECT guild_id, user_id, season, division, stat_type, SUM(count)
+        FROM player_gw_stats
+        WHERE guild_id = ?
+        GROUP BY guild_id, user_id, season, division, stat_type
+    ''', lambda rng, enc, league: (GUILD_ID,)),
+    "rebuild_totals": ('''
+        SELECT user_id, stat_type, division, SUM(count) FROM (
+            SELECT user_id, stat_type, division, count FROM player_gw_stats WHERE guild_id = ?
+            UNION ALL
+            SELECT user_id, stat_type, division, count FROM season_stats WHERE guild_id = ?
+        )
+        GROUP BY user_id, stat_type, division
+    ''', lambda rng, enc, league: (GUILD_ID, GUILD_ID)),
+    "notification_totals": ('''
+        SELECT stat_type, SUM(count) as total FROM (
+            SELECT stat_type, count FROM player_gw_stats WHERE guild_id = ? AND user_id = ? AND division = ?
+            UNION ALL
+            SELECT stat_type, count FROM season_stats WHERE guild_id = ? AND user_id = ? AND division = ?
+        )
+        GROUP BY stat_type
+    ''', lambda rng, enc, league: (GUILD_ID, rng.randrange(league.players), enc.division(rng.choice(league.divisions))) * 2),
+    "removestats_lookup": ('''
+        SELECT id, count FROM player_gw_stats
+        WHERE guild_id = ? AND user_id = ? AND gw = ? AND season = ? AND stat_type = ? AND division = ?
+        ORDER BY id LIMIT 1
+    ''', lambda rng, enc, league: (
+        GUILD_ID, rng.randrange(league.players), rng.randint(1, league.gws), league.seasons,
+        enc.stat(rng.choice(list(STAT_CODES))), enc.division(rng.choice(league.divisions))
+    )),
+}
+
+
+class Strings:
+    stat = staticmethod(lambda name: name)
+    division = staticmethod(lambda name: name)
+
+
+class Codes:
+    stat = staticmethod(STAT_CODES.__getitem__)
+    division = staticmethod(DIVISION_CODES.__getitem__)
+
+
+async def build_before(path: str, args) -> int:
+    rng = random.Random(args.seed)
+    divisions = list(DIVISION_CODES)
+    every = list(migrations.MIGRATIONS)
+    migrations.MIGRATIONS[:] = [m for m in every if m.version < 7]
+    database = Database(path)
+    await database.connect()
+    try:
+        await migrations.migrate(database)
+        rows = [
+            (GUILD_ID, user_id, gw, season, rng.choice(list(STAT_CODES)), rng.randint(1, 2), divisions[user_id % len(divisions)])
+            for season in range(1, args.seasons + 1)
+            for gw in range(1, args.gws + 1)
+            for user_id in range(args.players)
+            if rng.random() < args.stat_rate
+        ]
+        async with database.transaction() as conn:
+            await conn.executemany('''
+                INSERT INTO player_gw_stats (guild_id, user_id, gw, season, stat_type, count, division)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+        # Closed the way a version 6 database did; SeasonArchive targets the latest schema
+        async with database.transaction() as conn:
+            for season in range(1, args.seasons):
+                await conn.execute('''
+                    INSERT INTO season_stats (guild_id, user_id, season, division, stat_type, count)
+                    SELECT guild_id, user_id, season, division, stat_type, SUM(count)
+                    FROM player_gw_stats
+                    WHERE guild_id = ? AND season = ?
+                    GROUP BY guild_id, user_id, season, division, stat_type
+                ''', (GUILD_ID, season))
+                await conn.execute(f'''
+                    INSERT INTO player_gw_stats_archive ({V6_GW_COLUMNS})
+                    SELECT {V6_GW_COLUMNS} FROM player_gw_stats
+                    WHERE guild_id = ? AND season = ?
+                ''', (GUILD_ID, season))
+                async with conn.execute('DELETE FROM player_gw_stats WHERE guild_id = ? AND season = ?', (GUILD_ID, season)) as cursor:
+                    raw_rows = cursor.rowcount
+                await conn.execute('INSERT INTO closed_seasons (guild_id, season, raw_rows) VALUES (?, ?, ?)', (GUILD_ID, season, raw_rows))
+    finally:
+        migrations.MIGRATIONS[:] = every
+        await database.close()
+    return len(rows)
+
+
+async def migrate_after(path: str) -> float:
+    database = Database(path)
+    await database.connect()
+    try:
+        started = time.perf_counter()
+        await migrations.migrate(database)
+        return time.perf_counter() - started
+    finally:
+        await database.close()
+
+
+def measure(path: str, encoding, args) -> dict:
+    conn = sqlite3.connect(path)
+    conn.execute('VACUUM')
+    sizes = dict(conn.execute(
+        f"SELECT name, SUM(pgsize) FROM dbstat WHERE name IN ({', '.join('?' * len(OBJECTS))}) GROUP BY name", OBJECTS
+    ).fetchall())
+    live_rows = conn.execute('SELECT COUNT(*) FROM player_gw_stats').fetchone()[0]
+    summary_rows = conn.execute('SELECT COUNT(*) FROM season_stats').fetchone()[0]
+    rng = random.Random(args.seed)
+    league = argparse.Namespace(players=args.players, gws=args.gws, seasons=args.seasons, divisions=list(DIVISION_CODES))
+    timings = {}
+    for name, (sql, params) in QUERIES.items():
+        samples = []
+        for _ in range(args.repeat):
+            values = params(rng, encoding, league)
+            started = time.perf_counter()
+            conn.execute(sql, values).fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+        timings[name] = round(statistics.median(samples), 4)
+    conn.close()
+    return {
+        "file_bytes": os.path.getsize(path),
+        "object_bytes": {name: sizes.get(name, 0) for name in OBJECTS},
+        "live_bytes_per_row": round(sizes.get("player_gw_stats", 0) / live_rows, 2) if live_rows else 0.0,
+        "summary_bytes_per_row": round(sizes.get("season_stats", 0) / summary_rows, 2) if summary_rows else 0.0,
+        "median_ms": timings,
+    }
+
+
+async def main_async(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        before_path = os.path.join(tmp, "before.db")
+        after_path = os.path.join(tmp, "after.db")
+        rows = await build_before(before_path, args)
+        shutil.copyfile(before_path, after_path)
+        migration_s = await migrate_after(after_path)
+        return {
+            "config": {"players": args.players, "seasons": args.seasons, "gws": args.gws, "gw_rows": rows, "repeat": args.repeat, "seed": args.seed},
+            "migration_s": round(migration_s, 3),
+            "before": measure(before_path, Strings, args),
+            "after": measure(after_path, Codes, args),
+        }
+
+
+def print_report(report: dict):
+    config = report["config"]
+    before, after = report["before"], report["after"]
+    print(f"{config['players']} players, {config['seasons']} seasons x {config['gws']} GWs ({config['gw_rows']} GW rows), "
+          f"migration took {report['migration_s']}s\n")
+    print(f"{'':<34}{'before':>12}{'after':>12}{'change':>9}")
+
+    def line(label, old, new):
+        change = f"{(new - old) / old * 100:+.0f}%" if old else ""
+        print(f"{label:<34}{old:>12}{new:>12}{change:>9}")
+
+    line("file bytes", before["file_bytes"], after["file_bytes"])
+    for name in OBJECTS:
+        line(f"{name} bytes", before["object_bytes"][name], after["object_bytes"][name])
+    line("live bytes/row", before["live_bytes_per_row"], after["live_bytes_per_row"])
+    line("summary bytes/row", before["summary_bytes_per_row"], after["summary_bytes_per_row"])
+    for name in QUERIES:
+        line(f"{name} ms", before["median_ms"][name], after["median_ms"][name])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--seasons", type=int, default=5)
+    parser.add_argument("--gws", type=int, default=22)
+    parser.add_argument("--stat-rate", type=float, default=0.5, help="chance a player logs a stat in a GW")
+    parser.add_argument("--repeat", type=int, default=50, help="runs per query; the median is reported")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
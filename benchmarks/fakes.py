@@ -0,0 +1,143 @@
+"""Stand-in Discord objects for driving command callbacks offline.
+
+Only the attributes and coroutines the commands in Main.py actually touch
+are implemented. Every call that would hit the Discord API returns
+immediately, so measured time is the bot's own work.
+"""
+import datetime
+import itertools
+
+_ids = itertools.count(10 ** 17)
+
+
+class FakeAsset:
+    url = "https://cdn.discordapp.com/embed/avatars/0.png"
+
+
+class FakePermissions:
+    def __init__(self, administrator: bool = False):
+        self.administrator = administrator
+        self.moderate_members = administrator
+
+
+class FakeRole:
+    def __init__(self, name: str, color=None, role_id: int = None):
+        self.id = role_id or next(_ids)
+        self.name = name
+        self.color = color
+        self.mention = f"<@&{self.id}>"
+        self.members = []
+
+    def __repr__(self):
+        return f"<FakeRole {self.name}>"
+
+
+class FakeMessage:
+    def __init__(self, channel_id: int = None):
+        self.id = next(_ids)
+        self.channel = FakeChannel(channel_id)
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int = None):
+        self.id = channel_id or next(_ids)
+
+
+class FakeMember:
+    def __init__(self, guild, user_id: int = None, name: str = None, administrator: bool = False):
+        self.id = user_id or next(_ids)
+        self.guild = guild
+        self.name = name or f"player{self.id}"
+        self.display_name = self.name
+        self.mention = f"<@{self.id}>"
+        self.display_avatar = FakeAsset()
+        self.guild_permissions = FakePermissions(administrator)
+        self.roles = [guild.default_role] if guild.default_role else []
+        self.bot = False
+        self.dms = 0
+
+    async def send(self, *args, **kwargs):
+        self.dms += 1
+        return FakeMessage()
+
+    async def add_roles(self, *roles, **kwargs):
+        for role in roles:
+            if role not in self.roles:
+                self.roles.append(role)
+
+    async def remove_roles(self, *roles, **kwargs):
+        self.roles = [role for role in self.roles if role not in roles]
+
+    async def edit(self, **kwargs):
+        pass
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int = None, name: str = "Benchmark League"):
+        self.id = guild_id or next(_ids)
+        self.name = name
+        self.default_role = FakeRole("@everyone", role_id=self.id)
+        self.roles = [self.default_role]
+        self.channels = []
+        self.permissions = FakePermissions()
+        self._members = {}
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    def add_member(self, member: FakeMember):
+        self._members[member.id] = member
+
+    def get_member(self, user_id: int):
+        return self._members.get(user_id)
+
+    def get_role(self, role_id: int):
+        return next((role for role in self.roles if role.id == role_id), None)
+
+    async def create_role(self, name: str, color=None, **kwargs):
+        role = FakeRole(name, color)
+        self.roles.append(role)
+        return role
+
+
+class FakeResponse:
+    def __init__(self):
+        self.messages = []
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self.messages.append(content if content is not None else kwargs)
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+    async def edit_message(self, **kwargs):
+        self._done = True
+        self.messages.append(kwargs)
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        self.messages.append(content if content is not None else kwargs)
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeMember, guild: FakeGuild):
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id
+        self.channel = None
+        self.channel_id = None
+        self.command = None
+        self.extras = {}
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
@@ -0,0 +1,77 @@
+"""Parsing and validation for /bulkaddstat attachments.
+
+A file is either CSV with a header row or a JSON list of objects, using the
+columns ``member``, ``stat_type``, ``count`` and optionally ``division``,
+``gw`` and ``season``. Rows are validated without touching the database;
+resolving ``member`` to a guild member is left to the caller.
+"""
+import csv
+import io
+import json
+
+from stats import DIVISION_CODES, STAT_COLUMNS
+
+MAX_FILE_BYTES = 1024 * 1024
+REQUIRED_COLUMNS = ("member", "stat_type", "count")
+# Longest cell value repeated back in a rejection reason
+MAX_ECHO = 32
+
+
+class BulkImportError(ValueError):
+    """The file as a whole could not be read."""
+
+
+def read_rows(filename: str, data: bytes) -> list:
+    """Decode an attachment into ``(line_number, row_dict)`` pairs."""
+    if len(data) > MAX_FILE_BYTES:
+        raise BulkImportError(f"File is larger than {MAX_FILE_BYTES // 1024} KB")
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise BulkImportError("File must be UTF-8 text")
+
+    if filename.lower().endswith(".json"):
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise BulkImportError(f"Invalid JSON: {e}")
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise BulkImportError("JSON must be a list of objects")
+        return list(enumerate(rows, start=1))
+
+    reader = csv.DictReader(io.StringIO(text))
+    if reader.fieldnames is None:
+        raise BulkImportError("CSV file is empty")
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    missing = [column for column in REQUIRED_COLUMNS if column not in reader.fieldnames]
+    if missing:
+        raise BulkImportError(f"CSV header is missing: {', '.join(missing)}")
+    # Line 1 is the header
+    return [(reader.line_num, row) for row in reader]
+
+
+def echo(value) -> str:
+    """A cell value shortened for repeating back to the moderator."""
+    text = str(value)
+    return text if len(text) <= MAX_ECHO else text[:MAX_ECHO - 1] + "…"
+
+
+def validate_row(row: dict, current_gw: int, current_season: int):
+    """Return ``(stat_type, count, division)`` or raise ValueError with the reason."""
+    stat_type = str(row.get("stat_type") or "").strip().lower()
+    if stat_type not in STAT_COLUMNS:
+        raise ValueError(f"unknown stat type '{echo(stat_type)}'")
+    try:
+        count = int(row.get("count"))
+    except (TypeError, ValueError):
+        raise ValueError("count must be a whole number")
+    if count <= 0:
+        raise ValueError("count must be greater than 0")
+    division = str(row.get("division") or "Div 1").strip()
+    if division not in DIVISION_CODES:
+        raise ValueError(f"unknown division '{echo(division)}'")
+    for column, current in (("gw", current_gw), ("season", current_season)):
+        value = row.get(column)
+        if value not in (None, "") and str(value).strip() != str(current):
+            raise ValueError(f"{column} {echo(value)} is not the current {column} ({current})")
+    return stat_type, count, division
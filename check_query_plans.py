@@ -0,0 +1,98 @@
+"""Fail if any SQL query used by the bot falls back to a table scan.
+
+Builds a fresh schema in a temporary database, collects every literal SQL
+statement from the bot's modules and runs ``EXPLAIN QUERY PLAN`` on each.
+Statements that are meant to read a whole table carry a ``/* full scan */``
+comment and are skipped. Statements reading GW rows from a ``{table}``
+placeholder are planned once for every table in ``archive.GW_TABLES``,
+with an archive file attached.
+
+    python check_query_plans.py
+"""
+import ast
+import asyncio
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+# migrations.py is left out: each migration targets the schema as it was at its own version
+MODULES = ["Main.py", "archive.py", "bulk_import.py", "config_service.py", "export.py", "history.py", "leaderboard.py", "notifications.py", "offers.py", "role_jobs.py", "scoring.py", "stats.py", "team_registry.py", "team_stats.py", "totw.py", "writer.py"]
+FULL_SCAN_MARKER = "/* full scan */"
+TABLE_PLACEHOLDER = "{table}"
+QUERY_RE = re.compile(
+    r"^\s*(?:/\*.*?\*/\s*)?(SELECT\b.*\bFROM|UPDATE\s+\w+\s+SET|DELETE\s+FROM|INSERT\b.*\bINTO)\b",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def collect_queries():
+    """Yield (module, line, sql) for every literal query string in MODULES."""
+    for module in MODULES:
+        with open(os.path.join(HERE, module), encoding="utf-8-sig") as f:
+            tree = ast.parse(f.read())
+        # Pieces of f-strings are built at runtime and can't be planned here
+        dynamic = {id(part) for node in ast.walk(tree) if isinstance(node, ast.JoinedStr) for part in node.values}
+        queries = [
+            node for node in ast.walk(tree)
+            if isinstance(node, ast.Constant) and isinstance(node.value, str)
+            and id(node) not in dynamic and QUERY_RE.match(node.value)
+        ]
+        for node in sorted(queries, key=lambda n: n.lineno):
+            yield module, node.lineno, node.value
+
+
+async def build_schema(path: str, archive_path: str):
+    from archive import SeasonArchive
+    from database import Database
+    from migrations import migrate
+    database = Database(path, archive_path)
+    await database.connect()
+    try:
+        await migrate(database)
+        # Closing an empty season creates the archive file's table and indexes the way the bot does
+        await SeasonArchive(database).close(0, 0)
+    finally:
+        await database.close()
+
+
+def plans(conn, sql: str):
+    """Yield ``(table, details)`` for ``sql``, once per GW table if it has a placeholder."""
+    from archive import GW_TABLES
+    tables = GW_TABLES if TABLE_PLACEHOLDER in sql else (None,)
+    for table in tables:
+        planned = sql.replace(TABLE_PLACEHOLDER, table) if table else sql
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {planned}", (None,) * planned.count("?")).fetchall()
+        yield table, [row[3] for row in rows]
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "plans.db")
+        archive_path = os.path.join(tmp, "plans_archive.db")
+        asyncio.run(build_schema(path, archive_path))
+        conn = sqlite3.connect(path)
+        conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+        failures = 0
+        for module, line, sql in collect_queries():
+            if FULL_SCAN_MARKER in sql:
+                continue
+            for table, details in plans(conn, sql):
+                # Scanning a subquery's own result set is fine; only table scans count
+                derived = {d.split()[1] for d in details if d.startswith(("MATERIALIZE ", "CO-ROUTINE "))}
+                scans = [d for d in details if d.startswith("SCAN") and d.split()[1] not in derived]
+                status = "FAIL" if scans else "ok"
+                failures += bool(scans)
+                where = f" [{table}]" if table else ""
+                print(f"{status:4} {module}:{line}{where}  {' | '.join(details) or '(no plan)'}")
+        conn.close()
+    if failures:
+        print(f"{failures} query(s) fall back to a table scan")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""In-memory, write-through view of the ``config`` table.
+
+The table is read once at startup; after that every read is served from
+memory and every write goes to the database and the cache together. Values
+are kept per guild, and a guild that never set a key sees its default.
+"""
+from database import Database
+from writer import WriteCoalescer
+
+# Values a guild sees before it has set them itself
+DEFAULTS = {
+    "current_gw": "1",
+    "current_season": "1",
+}
+
+
+class ConfigService:
+    def __init__(self, database: Database, writer: WriteCoalescer):
+        self.db = database
+        self.writer = writer
+        # guild_id -> {key: value}
+        self._values = {}
+
+    async def load(self):
+        rows = await self.db.fetchall('/* full scan */ SELECT guild_id, key, value FROM config')
+        self._values = {}
+        for guild_id, key, value in rows:
+            self._values.setdefault(guild_id, {})[key] = value
+
+    def get(self, guild_id: int, key: str, default: str = None) -> str:
+        value = self._values.get(guild_id, {}).get(key)
+        if value is None:
+            value = DEFAULTS.get(key, default)
+        return value
+
+    def get_int(self, guild_id: int, key: str, default: int = None) -> int:
+        value = self.get(guild_id, key)
+        return default if value is None else int(value)
+
+    async def set_many(self, guild_id: int, values: dict):
+        """Write several keys in one transaction, then publish them to the cache."""
+        values = {key: str(value) for key, value in values.items()}
+
+        async def write(conn):
+            await conn.executemany(
+                'INSERT INTO config (guild_id, key, value) VALUES (?, ?, ?) '
+                'ON CONFLICT(guild_id, key) DO UPDATE SET value = excluded.value',
+                [(guild_id, key, value) for key, value in values.items()]
+            )
+        await self.writer.submit(write)
+        # Only reached once the commit succeeded, so the cache never runs ahead of the DB
+        self._values.setdefault(guild_id, {}).update(values)
+
+    async def set(self, guild_id: int, key: str, value):
+        await self.set_many(guild_id, {key: value})
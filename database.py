@@ -0,0 +1,102 @@
+"""Shared SQLite connection layer for the NOVA bot.
+
+One process-wide :class:`Database` owns two long-lived aiosqlite connections:
+a writer, serialized by a lock so transactions from concurrent commands never
+interleave, and a reader that WAL mode lets run alongside it. If an archive
+file is configured, it is attached to both as the ``archive`` schema.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+DEFAULT_DB_PATH = "vrfs_stats.db"
+
+# Size of sqlite3's per-connection prepared statement cache
+STATEMENT_CACHE_SIZE = 256
+
+
+class Database:
+    def __init__(self, path: str = None, archive_path: str = None):
+        # Resolved on connect so a .env loaded after import still applies
+        self.path = path
+        self.archive_path = archive_path
+        self._writer = None
+        self._reader = None
+        self._write_lock = asyncio.Lock()
+        # Optional on_query(sql, seconds) callback, called after every read and transaction
+        self.on_query = None
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    async def _open(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.path, cached_statements=STATEMENT_CACHE_SIZE)
+        await conn.execute('PRAGMA journal_mode=WAL')
+        await conn.execute('PRAGMA synchronous=NORMAL')
+        await conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    async def connect(self):
+        # Safe to call more than once; only the first call opens connections
+        if self.connected:
+            return
+        if self.path is None:
+            self.path = os.getenv("VRFS_DB_PATH", DEFAULT_DB_PATH)
+        if self.archive_path is None:
+            self.archive_path = os.getenv("VRFS_ARCHIVE_DB_PATH") or None
+        self._writer = await self._open()
+        self._reader = await self._open()
+        if self.archive_path:
+            for conn in (self._writer, self._reader):
+                await conn.execute('ATTACH DATABASE ? AS archive', (self.archive_path,))
+
+    async def close(self):
+        for conn in (self._reader, self._writer):
+            if conn is not None:
+                await conn.close()
+        self._writer = None
+        self._reader = None
+
+    def _observe(self, sql: str, started: float):
+        if self.on_query is not None:
+            self.on_query(sql, time.perf_counter() - started)
+
+    async def fetchone(self, sql: str, params: tuple = ()):
+        started = time.perf_counter()
+        try:
+            async with self._reader.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+        finally:
+            self._observe(sql, started)
+
+    async def fetchall(self, sql: str, params: tuple = ()):
+        started = time.perf_counter()
+        try:
+            async with self._reader.execute(sql, params) as cursor:
+                return await cursor.fetchall()
+        finally:
+            self._observe(sql, started)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Yield the writer connection; commit on success, roll back on error."""
+        started = time.perf_counter()
+        try:
+            async with self._write_lock:
+                try:
+                    yield self._writer
+                except BaseException:
+                    await self._writer.rollback()
+                    raise
+                else:
+                    await self._writer.commit()
+        finally:
+            # Includes time spent waiting for the writer
+            self._observe("transaction", started)
+
+
+db = Database()
@@ -0,0 +1,112 @@
+"""Streaming season exports for /export.
+
+Rows are read in id order, in keyset batches on the reader connection. Each
+batch is written as CSV or JSON into a gzip file on disk from a worker
+thread. Only one batch is held in memory at a time, and neither the queries
+nor the compression run on the event loop.
+"""
+import asyncio
+import csv
+import gzip
+import io
+import json
+import tempfile
+
+from archive import GW_TABLES
+from database import Database
+from scoring import scoring
+from stats import DIVISION_CODES, DIVISION_NAMES, STAT_NAMES
+
+BATCH_SIZE = 1000
+COLUMNS = ["id", "season", "gw", "division", "user_id", "member", "stat_type", "count", "points"]
+
+
+_SEASON_SQL = '''
+    SELECT id, gw, season, division, user_id, stat_type, count
+    FROM {table}
+    WHERE guild_id = ? AND season = ? AND (? IS NULL OR division = ?) AND id > ?
+    ORDER BY id LIMIT ?
+'''
+
+
+async def iter_season_rows(database: Database, guild_id: int, season: int, division: str = None, table: str = "player_gw_stats", batch_size: int = BATCH_SIZE):
+    """Yield ``(id, gw, season, division, user_id, stat_type, count)`` for one season in id order.
+
+    ``division`` limits the rows to one division. ``table`` is one of
+    :data:`archive.GW_TABLES`: the live table, or the archive a closed
+    season was moved to.
+    """
+    if table not in GW_TABLES:
+        raise ValueError(f"Not a GW stats table: {table}")
+    sql = _SEASON_SQL.format(table=table)
+    division_code = DIVISION_CODES[division] if division else None
+    last_id = 0
+    while True:
+        rows = await database.fetchall(sql, (guild_id, season, division_code, division_code, last_id, batch_size))
+        if not rows:
+            return
+        for row in rows:
+            yield row
+        last_id = rows[-1][0]
+
+
+class _GzipWriter:
+    """CSV or JSON array writer over a gzip temp file; every method runs in a worker thread."""
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.file = tempfile.TemporaryFile()
+        self._gzip = gzip.GzipFile(fileobj=self.file, mode="wb")
+        self._text = io.TextIOWrapper(self._gzip, encoding="utf-8", newline="")
+        self._first = True
+        if fmt == "csv":
+            self._csv = csv.writer(self._text)
+            self._csv.writerow(COLUMNS)
+        else:
+            self._text.write("[")
+
+    def write(self, records: list):
+        if self.fmt == "csv":
+            self._csv.writerows(records)
+            return
+        for record in records:
+            self._text.write(("\n" if self._first else ",\n") + json.dumps(dict(zip(COLUMNS, record)), ensure_ascii=False))
+            self._first = False
+
+    def finish(self) -> int:
+        if self.fmt == "json":
+            self._text.write("\n]\n")
+        # Closing the wrapper closes the gzip stream but leaves the temp file open
+        self._text.close()
+        size = self.file.tell()
+        self.file.seek(0)
+        return size
+
+
+async def export_season(rows, fmt: str, member_name) -> tuple:
+    """Write ``rows`` from :func:`iter_season_rows` to a gzip file.
+
+    Returns ``(file, row_count, compressed_bytes)``. The caller closes the file.
+    ``member_name(user_id)`` supplies the member column.
+    """
+    writer = await asyncio.to_thread(_GzipWriter, fmt)
+    count = 0
+    batch = []
+    try:
+        async for entry_id, gw, season, row_division, user_id, stat_code, amount in rows:
+            division_name = DIVISION_NAMES.get(row_division)
+            stat_type = STAT_NAMES.get(stat_code)
+            points = scoring.points(division_name, stat_type) * amount if division_name and stat_type else 0
+            batch.append((entry_id, season, gw, division_name, user_id, member_name(user_id), stat_type, amount, points))
+            if len(batch) >= BATCH_SIZE:
+                await asyncio.to_thread(writer.write, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(writer.write, batch)
+            count += len(batch)
+        size = await asyncio.to_thread(writer.finish)
+    except BaseException:
+        writer.file.close()
+        raise
+    return writer.file, count, size
@@ -0,0 +1,50 @@
+"""Per-gameweek stat history for /history.
+
+A player's season is read one page at a time, keyed on ``(gw, id)`` after
+the last row shown, so a page costs the same whether it is the first or the
+fiftieth and nothing beyond the current page is held in memory.
+"""
+from archive import GW_TABLES
+from database import Database
+
+PER_PAGE = 15
+
+
+_PAGE_SQL = '''
+    SELECT id, gw, division, stat_type, count
+    FROM {table}
+    WHERE guild_id = ? AND user_id = ? AND season = ? AND (gw, id) > (?, ?)
+    ORDER BY gw, id LIMIT ?
+'''
+
+
+async def fetch_page(database: Database, guild_id: int, user_id: int, season: int, after: tuple = (0, 0), table: str = "player_gw_stats", limit: int = PER_PAGE) -> list:
+    """Return up to ``limit`` ``(id, gw, division, stat_type, count)`` rows after the ``(gw, id)`` cursor.
+
+    ``table`` is one of :data:`archive.GW_TABLES`: the live table, or the
+    archive a closed season was moved to.
+    """
+    if table not in GW_TABLES:
+        raise ValueError(f"Not a GW stats table: {table}")
+    gw, last_id = after
+    return await database.fetchall(_PAGE_SQL.format(table=table), (guild_id, user_id, season, gw, last_id, limit))
+
+
+async def season_points(database: Database, guild_id: int, user_id: int, season: int, closed: bool) -> int:
+    """A player's points for the whole season."""
+    if closed:
+        # Closed seasons keep one summary row per stat, so the archive isn't read
+        row = await database.fetchone('''
+            SELECT COALESCE(SUM(s.count * w.points), 0)
+            FROM season_stats s
+            JOIN point_weights w ON w.division = s.division AND w.stat_type = s.stat_type
+            WHERE s.guild_id = ? AND s.user_id = ? AND s.season = ?
+        ''', (guild_id, user_id, season))
+    else:
+        row = await database.fetchone('''
+            SELECT COALESCE(SUM(g.count * w.points), 0)
+            FROM player_gw_stats g
+            JOIN point_weights w ON w.division = g.division AND w.stat_type = g.stat_type
+            WHERE g.guild_id = ? AND g.user_id = ? AND g.season = ?
+        ''', (guild_id, user_id, season))
+    return row[0]
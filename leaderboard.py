@@ -0,0 +1,116 @@
+"""In-memory leaderboards kept current by stat writes.
+
+Every (guild, season, division, metric) combination has its own
+:class:`RankingIndex`, with ``None`` standing for "all seasons" / "all divisions". The boards are
+built at startup from the closed-season summaries plus one grouped query
+over the live rows, and from then on only receive deltas, so serving a page
+never touches ``player_gw_stats``.
+"""
+import bisect
+
+from database import Database
+from scoring import scoring
+from stats import DIVISION_CODES, DIVISION_NAMES, STAT_COLUMNS, STAT_NAMES
+
+# Leaderboard metrics: every stat type plus total points
+METRICS = ["points"] + list(STAT_COLUMNS)
+
+
+class RankingIndex:
+    """Scores for one leaderboard, held in rank order."""
+
+    def __init__(self, scores: dict = None):
+        self._scores = {user_id: score for user_id, score in (scores or {}).items() if score > 0}
+        # (-score, user_id) keeps the highest score first and breaks ties stably
+        self._order = sorted((-score, user_id) for user_id, score in self._scores.items())
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def add(self, user_id: int, delta: int):
+        """Shift a player's score by ``delta`` with two binary searches."""
+        old = self._scores.get(user_id, 0)
+        if old > 0:
+            del self._order[bisect.bisect_left(self._order, (-old, user_id))]
+        new = old + delta
+        if new > 0:
+            self._scores[user_id] = new
+            bisect.insort(self._order, (-new, user_id))
+        else:
+            self._scores.pop(user_id, None)
+
+    def score(self, user_id: int) -> int:
+        return self._scores.get(user_id, 0)
+
+    def slice(self, offset: int, limit: int) -> list:
+        """Return ``(user_id, score)`` pairs for ranks ``offset`` to ``offset + limit``."""
+        return [(user_id, -score) for score, user_id in self._order[offset:offset + limit]]
+
+
+class Leaderboards:
+    def __init__(self):
+        self._boards = {}
+
+    def _board(self, guild_id, season, division, metric) -> RankingIndex:
+        key = (guild_id, season, division, metric)
+        if key not in self._boards:
+            self._boards[key] = RankingIndex()
+        return self._boards[key]
+
+    async def load(self, database: Database, guild_id: int = None):
+        """Rebuild every board, or only ``guild_id``'s, from the season summaries and live GW rows."""
+        if guild_id is None:
+            rows = await database.fetchall('''
+                /* full scan */
+                SELECT guild_id, user_id, season, division, stat_type, count FROM season_stats
+            ''')
+            rows += await database.fetchall('''
+                /* full scan */
+                SELECT guild_id, user_id, season, division, stat_type, SUM(count)
+                FROM player_gw_stats
+                GROUP BY guild_id, user_id, season, division, stat_type
+            ''')
+        else:
+            rows = await database.fetchall('''
+                SELECT guild_id, user_id, season, division, stat_type, count FROM season_stats WHERE guild_id = ?
+            ''', (guild_id,))
+            rows += await database.fetchall('''
+                SELECT guild_id, user_id, season, division, stat_type, SUM(count)
+                FROM player_gw_stats
+                WHERE guild_id = ?
+                GROUP BY guild_id, user_id, season, division, stat_type
+            ''', (guild_id,))
+        scores = {}
+        for guild_id, user_id, season, division_code, stat_code, total in rows:
+            division = DIVISION_NAMES.get(division_code)
+            stat_type = STAT_NAMES.get(stat_code)
+            for key, value in self._deltas(guild_id, season, division, stat_type, total):
+                board = scores.setdefault(key, {})
+                board[user_id] = board.get(user_id, 0) + value
+        if guild_id is None:
+            self._boards = {}
+        else:
+            self._boards = {key: board for key, board in self._boards.items() if key[0] != guild_id}
+        self._boards.update((key, RankingIndex(board)) for key, board in scores.items())
+
+    def _deltas(self, guild_id, season, division, stat_type, count):
+        if stat_type not in STAT_COLUMNS or division not in DIVISION_CODES:
+            return
+        points = scoring.points(division, stat_type) * count
+        for s in (season, None):
+            for d in (division, None):
+                yield (guild_id, s, d, stat_type), count
+                yield (guild_id, s, d, "points"), points
+
+    def apply(self, guild_id: int, user_id: int, season: int, division: str, stat_type: str, count: int):
+        """Record ``count`` (negative for removals) of a stat on every board it affects."""
+        for key, value in self._deltas(guild_id, season, division, stat_type, count):
+            self._board(*key).add(user_id, value)
+
+    def page(self, guild_id: int, season, division, metric: str, page: int, per_page: int = 25):
+        """Return ``(entries, page_count)`` for a zero-based page of a board."""
+        board = self._boards.get((guild_id, season, division, metric))
+        if board is None:
+            return [], 0
+        page_count = (len(board) + per_page - 1) // per_page
+        return board.slice(page * per_page, per_page), page_count
@@ -0,0 +1,230 @@
+"""Per-command latency, DB time and Discord API time instrumentation.
+
+Every app command gets a :class:`CommandTiming` when it starts. The timing
+is also held in a context variable, so DB queries and Discord HTTP calls made
+by the command add their time to it. When the command finishes, its wall,
+DB and API time go into rolling :class:`Histogram` objects. These back the
+/metrics command and a Prometheus text file that is written on an interval.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from collections import deque
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_current_timing = contextvars.ContextVar("current_command_timing", default=None)
+
+
+class Histogram:
+    """Cumulative bucket counts plus a rolling window of recent samples for percentiles."""
+
+    def __init__(self, window: int = 2048):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+    def percentile(self, pct: float) -> float:
+        if not self.recent:
+            return 0.0
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(pct / 100 * len(values)))]
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class CommandTiming:
+    def __init__(self, command: str):
+        self.command = command
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.api = 0.0
+
+
+class Metrics:
+    def __init__(self, slow_query_ms: float = 100.0, lag_interval: float = 0.5):
+        self.slow_query_ms = slow_query_ms
+        self.lag_interval = lag_interval
+        self.command_wall = {}
+        self.command_db = {}
+        self.command_api = {}
+        self.command_errors = {}
+        self.db_queries = Histogram()
+        self.api_requests = Histogram()
+        self.loop_lag = Histogram()
+        self.slow_queries = 0
+        # Callbacks returning (name, help, value) counters owned by other components
+        self._counter_sources = []
+        self._tasks = []
+
+    # --- Commands ---
+
+    def start_command(self, interaction):
+        command = interaction.command.qualified_name if interaction.command else "unknown"
+        timing = CommandTiming(command)
+        # extras travels with the interaction into the completion event, which runs in another task
+        interaction.extras["timing"] = timing
+        _current_timing.set(timing)
+
+    def finish_command(self, interaction, failed: bool = False):
+        timing = interaction.extras.pop("timing", None)
+        if timing is None:
+            return
+        name = timing.command
+        for histograms, value in (
+            (self.command_wall, time.perf_counter() - timing.started),
+            (self.command_db, timing.db),
+            (self.command_api, timing.api),
+        ):
+            histograms.setdefault(name, Histogram()).observe(value)
+        if failed:
+            self.command_errors[name] = self.command_errors.get(name, 0) + 1
+
+    # --- DB and Discord API hooks ---
+
+    def record_query(self, sql: str, seconds: float):
+        """Database.on_query hook."""
+        self.db_queries.observe(seconds)
+        timing = _current_timing.get()
+        if timing is not None:
+            timing.db += seconds
+        if seconds * 1000 >= self.slow_query_ms:
+            self.slow_queries += 1
+            command = f" in /{timing.command}" if timing else ""
+            print(f"Slow query ({seconds * 1000:.1f}ms){command}: {' '.join(sql.split())[:200]}")
+
+    def record_write(self, seconds: float):
+        """WriteCoalescer.on_write hook; the transaction itself is already counted by record_query."""
+        timing = _current_timing.get()
+        if timing is not None:
+            timing.db += seconds
+
+    def _timed_request(self, request):
+        @functools.wraps(request)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await request(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                self.api_requests.observe(elapsed)
+                timing = _current_timing.get()
+                if timing is not None:
+                    timing.api += elapsed
+        return wrapper
+
+    def instrument_http(self, http):
+        """Time REST calls on the bot's HTTPClient and the webhook adapter used for interaction responses."""
+        from discord.webhook.async_ import async_context
+        http.request = self._timed_request(http.request)
+        adapter = async_context.get()
+        adapter.request = self._timed_request(adapter.request)
+
+    def register_counters(self, source):
+        """Export counters kept elsewhere; ``source()`` returns ``(name, help, value)`` tuples."""
+        self._counter_sources.append(source)
+
+    # --- Background tasks ---
+
+    def start(self, prometheus_path: str = None, write_interval: float = 15.0):
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._monitor_loop_lag()))
+        if prometheus_path:
+            self._tasks.append(asyncio.create_task(self._write_prometheus_periodically(prometheus_path, write_interval)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _monitor_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            lag = max(0.0, loop.time() - expected)
+            self.loop_lag.observe(lag)
+            if lag >= 0.25:
+                print(f"Event loop lagged {lag * 1000:.0f}ms")
+
+    async def _write_prometheus_periodically(self, path: str, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.write_prometheus(path)
+            except OSError as e:
+                print(f"Failed to write metrics to {path}: {e}")
+
+    # --- Exposition ---
+
+    def write_prometheus(self, path: str):
+        # Write then rename so scrapers never read a half-written file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def render_prometheus(self) -> str:
+        lines = []
+
+        def histogram(name: str, help_text: str, series: dict):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, hist in series.items():
+                label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+                prefix = f"{label_text}," if label_text else ""
+                for bound, count in zip(BUCKETS, hist.buckets):
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {hist.count}')
+                suffix = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{name}_sum{suffix} {hist.total:.6f}")
+                lines.append(f"{name}_count{suffix} {hist.count}")
+
+        def per_command(histograms: dict) -> dict:
+            return {(("command", name),): hist for name, hist in sorted(histograms.items())}
+
+        histogram("nova_command_duration_seconds", "Wall time of app commands.", per_command(self.command_wall))
+        histogram("nova_command_db_seconds", "Time app commands spent in database calls.", per_command(self.command_db))
+        histogram("nova_command_discord_api_seconds", "Time app commands spent in Discord API calls.", per_command(self.command_api))
+        histogram("nova_db_query_seconds", "Duration of individual database calls.", {(): self.db_queries})
+        histogram("nova_discord_api_request_seconds", "Duration of individual Discord API requests.", {(): self.api_requests})
+        histogram("nova_event_loop_lag_seconds", "How late the event loop woke a sleeping task.", {(): self.loop_lag})
+        lines.append("# HELP nova_command_errors_total App commands that raised an error.")
+        lines.append("# TYPE nova_command_errors_total counter")
+        for name, count in sorted(self.command_errors.items()):
+            lines.append(f'nova_command_errors_total{{command="{name}"}} {count}')
+        lines.append("# HELP nova_slow_queries_total Database calls slower than the slow query threshold.")
+        lines.append("# TYPE nova_slow_queries_total counter")
+        lines.append(f"nova_slow_queries_total {self.slow_queries}")
+        for source in self._counter_sources:
+            for name, help_text, value in source():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary_rows(self) -> list:
+        """``(command, count, errors, p50, p95, p99, avg db, avg api)`` rows, busiest first, in ms."""
+        rows = []
+        for name, wall in self.command_wall.items():
+            rows.append((
+                name, wall.count, self.command_errors.get(name, 0),
+                wall.percentile(50) * 1000, wall.percentile(95) * 1000, wall.percentile(99) * 1000,
+                self.command_db[name].mean() * 1000, self.command_api[name].mean() * 1000,
+            ))
+        return sorted(rows, key=lambda row: row[1], reverse=True)
@@ -0,0 +1,561 @@
+"""Versioned schema migrations.
+
+Each migration runs once, in version order, and is recorded in the
+``schema_version`` table. Plain migrations get the writer connection and
+run in a single transaction. Batched migrations get the :class:`Database`
+and commit in small batches via :func:`for_each_batch`, so a backfill over
+a large table never holds the writer or the event loop for long. A batched
+migration must be safe to re-run from the start if the process stops halfway.
+
+Migrations marked ``archive=True`` also change or read the attached archive
+file. The file keeps the schema version it was last migrated with in its
+``user_version``, and a file that missed one of those migrations because it
+wasn't attached is refused rather than read with the wrong layout.
+
+Migrations describe the schema as it was when they were written, so they
+carry their own copies of any column lists or point values they need.
+"""
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from database import Database
+
+BATCH_SIZE = 500
+# Archive files weren't stamped before this version, so an unstamped file is trusted up to it
+UNSTAMPED_ARCHIVE_VERSION = 16
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    run: Callable[..., Awaitable[None]]
+    batched: bool = False
+    archive: bool = False
+
+
+MIGRATIONS = []
+
+
+def migration(version: int, description: str, batched: bool = False, archive: bool = False):
+    def decorator(func):
+        MIGRATIONS.append(Migration(version, description, func, batched, archive))
+        return func
+    return decorator
+
+
+async def for_each_batch(database: Database, key_sql: str, handler, batch_size: int = BATCH_SIZE):
+    """Walk the keys returned by ``key_sql`` in ascending order, one transaction per batch.
+
+    ``key_sql`` takes the last key seen and a limit, e.g.
+    ``SELECT DISTINCT user_id FROM t WHERE user_id > ? ORDER BY user_id LIMIT ?``.
+    ``handler(conn, keys)`` is awaited for every batch.
+    """
+    last_key = -(2 ** 63)
+    while True:
+        keys = [row[0] for row in await database.fetchall(key_sql, (last_key, batch_size))]
+        if not keys:
+            return
+        async with database.transaction() as conn:
+            await handler(conn, keys)
+        last_key = keys[-1]
+        # Let commands run between batches
+        await asyncio.sleep(0)
+
+
+async def _archive_attached(conn) -> bool:
+    """Whether an archive file is attached and already holds archived GW rows."""
+    async with conn.execute("SELECT 1 FROM pragma_database_list WHERE name = 'archive'") as cursor:
+        if await cursor.fetchone() is None:
+            return False
+    async with conn.execute("SELECT 1 FROM archive.sqlite_master WHERE type = 'table' AND name = 'player_gw_stats'") as cursor:
+        return await cursor.fetchone() is not None
+
+
+async def _check_archive_version(conn, database: Database, current: int):
+    """Refuse an archive file that missed an archive migration up to ``current``."""
+    if not await _archive_attached(conn):
+        return
+    async with conn.execute('PRAGMA archive.user_version') as cursor:
+        stamped = (await cursor.fetchone())[0]
+    if stamped == 0 and current <= UNSTAMPED_ARCHIVE_VERSION:
+        return
+    missed = [str(m.version) for m in MIGRATIONS if m.archive and stamped < m.version <= current]
+    if missed:
+        raise RuntimeError(
+            f"The archive file {database.archive_path} was not attached when migration(s) {', '.join(missed)} ran, "
+            "so its rows can't be read safely. Attach it to a backup of the database from before then, "
+            "or unset VRFS_ARCHIVE_DB_PATH."
+        )
+
+
+async def migrate(database: Database) -> list:
+    """Apply every pending migration; return the versions that ran."""
+    async with database.transaction() as conn:
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    applied = {row[0] for row in await database.fetchall('/* full scan */ SELECT version FROM schema_version')}
+    async with database.transaction() as conn:
+        await _check_archive_version(conn, database, max(applied, default=0))
+
+    ran = []
+    for step in sorted(MIGRATIONS, key=lambda m: m.version):
+        if step.version in applied:
+            continue
+        print(f"Applying migration {step.version}: {step.description}")
+        if step.batched:
+            await step.run(database)
+            async with database.transaction() as conn:
+                await conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)', (step.version, step.description))
+        else:
+            async with database.transaction() as conn:
+                await step.run(conn)
+                await conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)', (step.version, step.description))
+        ran.append(step.version)
+    async with database.transaction() as conn:
+        async with conn.execute("SELECT 1 FROM pragma_database_list WHERE name = 'archive'") as cursor:
+            attached = await cursor.fetchone()
+        if attached:
+            await conn.execute(f'PRAGMA archive.user_version = {max(applied | set(ran), default=0)}')
+    return ran
+
+
+# Migrations 1-4 are written to also be safe on databases created before
+# schema_version existed, where some of these objects are already present.
+
+@migration(1, "create base tables")
+async def create_base_tables(conn):
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS player_stats (
+            user_id INTEGER PRIMARY KEY,
+            goals INTEGER DEFAULT 0,
+            assists INTEGER DEFAULT 0,
+            cleansheets_defender INTEGER DEFAULT 0,
+            cleansheets_goalkeeper INTEGER DEFAULT 0,
+            motm INTEGER DEFAULT 0,
+            totw INTEGER DEFAULT 0,
+            position TEXT
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS player_gw_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            gw INTEGER,
+            season INTEGER,
+            stat_type TEXT,
+            count INTEGER,
+            division TEXT DEFAULT 'Div 1',
+            FOREIGN KEY(user_id) REFERENCES player_stats(user_id)
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS config (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    await conn.execute('CREATE TABLE IF NOT EXISTS teams (team_name TEXT PRIMARY KEY, division TEXT)')
+    # Initialize default GW and Season
+    await conn.execute('INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)', ('current_gw', '1'))
+    await conn.execute('INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)', ('current_season', '1'))
+
+
+@migration(2, "add per-division points columns to player_stats")
+async def add_points_columns(conn):
+    async with conn.execute('PRAGMA table_info(player_stats)') as cursor:
+        existing = {row[1] for row in await cursor.fetchall()}
+    for column in ("points_div1", "points_div2", "points_div3"):
+        if column not in existing:
+            await conn.execute(f'ALTER TABLE player_stats ADD COLUMN {column} INTEGER DEFAULT 0')
+
+
+@migration(3, "index player_gw_stats and teams lookups")
+async def add_lookup_indexes(conn):
+    await conn.execute('CREATE INDEX IF NOT EXISTS idx_gw_stats_user_division ON player_gw_stats (user_id, division, stat_type, count)')
+    await conn.execute('CREATE INDEX IF NOT EXISTS idx_gw_stats_entry ON player_gw_stats (user_id, season, gw, stat_type, division)')
+    await conn.execute('CREATE INDEX IF NOT EXISTS idx_teams_division ON teams (division)')
+
+
+# Stat type -> (player_stats column, points in Div 1, Div 2, Div 3) as of migration 4
+_V4_STATS = {
+    "goal": ("goals", 9, 6, 3),
+    "assist": ("assists", 7, 5, 2),
+    "defender cleansheet": ("cleansheets_defender", 10, 8, 6),
+    "goalkeeper cleansheet": ("cleansheets_goalkeeper", 12, 10, 8),
+    "motm": ("motm", 8, 6, 3),
+    "totw": ("totw", 8, 6, 3),
+}
+
+
+@migration(4, "backfill player_stats totals from player_gw_stats", batched=True)
+async def backfill_aggregates(database):
+    totals = [
+        f"{column} = (SELECT COALESCE(SUM(count), 0) FROM player_gw_stats g "
+        f"WHERE g.user_id = player_stats.user_id AND g.stat_type = '{stat_type}')"
+        for stat_type, (column, *_) in _V4_STATS.items()
+    ]
+    for i, division in enumerate(("Div 1", "Div 2", "Div 3")):
+        weights = " ".join(f"WHEN '{stat_type}' THEN {points[i]}" for stat_type, (_, *points) in _V4_STATS.items())
+        totals.append(
+            f"points_div{i + 1} = (SELECT COALESCE(SUM(count * CASE stat_type {weights} ELSE 0 END), 0) "
+            f"FROM player_gw_stats g WHERE g.user_id = player_stats.user_id AND g.division = '{division}')"
+        )
+    update_sql = f"UPDATE player_stats SET {', '.join(totals)} WHERE user_id BETWEEN ? AND ?"
+
+    async def rebuild(conn, user_ids):
+        await conn.executemany('INSERT OR IGNORE INTO player_stats (user_id) VALUES (?)', [(u,) for u in user_ids])
+        await conn.execute(update_sql, (user_ids[0], user_ids[-1]))
+
+    await for_each_batch(
+        database,
+        'SELECT DISTINCT user_id FROM player_gw_stats WHERE user_id > ? ORDER BY user_id LIMIT ?',
+        rebuild
+    )
+
+
+@migration(5, "scope league data by guild")
+async def scope_by_guild(conn):
+    # Rows from before multi-guild support belong to this guild
+    legacy_guild = os.getenv("VRFS_LEGACY_GUILD_ID")
+    if legacy_guild is None:
+        # Only a database holding nothing but the default GW and season can go without one
+        async with conn.execute('''
+            SELECT EXISTS (SELECT 1 FROM player_stats)
+                OR EXISTS (SELECT 1 FROM player_gw_stats)
+                OR EXISTS (SELECT 1 FROM teams)
+                OR EXISTS (SELECT 1 FROM config WHERE (key, value) NOT IN (VALUES ('current_gw', '1'), ('current_season', '1')))
+        ''') as cursor:
+            has_league_data = (await cursor.fetchone())[0]
+        if has_league_data:
+            raise RuntimeError(
+                "This database holds league data from before multi-guild support. "
+                "Set VRFS_LEGACY_GUILD_ID to the id of the guild it belongs to and restart."
+            )
+    legacy_guild = int(legacy_guild or 0)
+    await conn.execute('''
+        CREATE TABLE player_stats_v5 (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            goals INTEGER DEFAULT 0,
+            assists INTEGER DEFAULT 0,
+            cleansheets_defender INTEGER DEFAULT 0,
+            cleansheets_goalkeeper INTEGER DEFAULT 0,
+            motm INTEGER DEFAULT 0,
+            totw INTEGER DEFAULT 0,
+            position TEXT,
+            points_div1 INTEGER DEFAULT 0,
+            points_div2 INTEGER DEFAULT 0,
+            points_div3 INTEGER DEFAULT 0,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    ''')
+    await conn.execute('''
+        INSERT INTO player_stats_v5
+        SELECT ?, user_id, goals, assists, cleansheets_defender, cleansheets_goalkeeper,
+               motm, totw, position, points_div1, points_div2, points_div3
+        FROM player_stats
+    ''', (legacy_guild,))
+    await conn.execute('''
+        CREATE TABLE player_gw_stats_v5 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER,
+            gw INTEGER,
+            season INTEGER,
+            stat_type TEXT,
+            count INTEGER,
+            division TEXT DEFAULT 'Div 1',
+            FOREIGN KEY(guild_id, user_id) REFERENCES player_stats(guild_id, user_id)
+        )
+    ''')
+    await conn.execute('''
+        INSERT INTO player_gw_stats_v5 (id, guild_id, user_id, gw, season, stat_type, count, division)
+        SELECT id, ?, user_id, gw, season, stat_type, count, division
+        FROM player_gw_stats
+    ''', (legacy_guild,))
+    await conn.execute('''
+        CREATE TABLE config_v5 (
+            guild_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            PRIMARY KEY (guild_id, key)
+        )
+    ''')
+    await conn.execute('INSERT INTO config_v5 SELECT ?, key, value FROM config', (legacy_guild,))
+    await conn.execute('''
+        CREATE TABLE teams_v5 (
+            guild_id INTEGER NOT NULL,
+            team_name TEXT NOT NULL,
+            division TEXT,
+            PRIMARY KEY (guild_id, team_name)
+        )
+    ''')
+    await conn.execute('INSERT INTO teams_v5 SELECT ?, team_name, division FROM teams', (legacy_guild,))
+
+    for table in ("player_gw_stats", "player_stats", "config", "teams"):
+        await conn.execute(f'DROP TABLE {table}')
+        await conn.execute(f'ALTER TABLE {table}_v5 RENAME TO {table}')
+
+    # Every lookup is now scoped to one guild, so guild_id leads each index
+    await conn.execute('CREATE INDEX idx_gw_stats_user_division ON player_gw_stats (guild_id, user_id, division, stat_type, count)')
+    await conn.execute('CREATE INDEX idx_gw_stats_entry ON player_gw_stats (guild_id, user_id, season, gw, stat_type, division)')
+    await conn.execute('CREATE INDEX idx_teams_division ON teams (guild_id, division)')
+
+
+@migration(6, "add season summaries and the raw row archive")
+async def add_season_archive(conn):
+    await conn.execute('''
+        CREATE TABLE season_stats (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            season INTEGER NOT NULL,
+            division TEXT NOT NULL,
+            stat_type TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user_id, season, division, stat_type)
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE closed_seasons (
+            guild_id INTEGER NOT NULL,
+            season INTEGER NOT NULL,
+            raw_rows INTEGER NOT NULL,
+            closed_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (guild_id, season)
+        )
+    ''')
+    # Raw rows of closed seasons land here unless an archive file is attached
+    await conn.execute('''
+        CREATE TABLE player_gw_stats_archive (
+            id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER,
+            gw INTEGER,
+            season INTEGER,
+            stat_type TEXT,
+            count INTEGER,
+            division TEXT
+        )
+    ''')
+
+
+# Codes as of migration 7; stats.STAT_CODES and stats.DIVISION_CODES must keep these values
+_V7_STAT_CODES = {"goal": 1, "assist": 2, "defender cleansheet": 3, "goalkeeper cleansheet": 4, "motm": 5, "totw": 6}
+_V7_DIVISION_CODES = {"Div 1": 1, "Div 2": 2, "Div 3": 3}
+
+
+@migration(7, "store stat types and divisions as integer codes", archive=True)
+async def encode_stat_columns(conn):
+    await conn.execute('CREATE TABLE stat_types (code INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)')
+    await conn.execute('CREATE TABLE divisions (code INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)')
+    await conn.executemany('INSERT INTO stat_types (code, name) VALUES (?, ?)', [(c, n) for n, c in _V7_STAT_CODES.items()])
+    await conn.executemany('INSERT INTO divisions (code, name) VALUES (?, ?)', [(c, n) for n, c in _V7_DIVISION_CODES.items()])
+
+    # Strings that don't match a known name become NULL, which aggregates already skip
+    stat_code = "(SELECT code FROM stat_types WHERE name = lower(trim(stat_type)))"
+    division_code = "(SELECT code FROM divisions WHERE name = trim(division))"
+
+    await conn.execute('''
+        CREATE TABLE player_gw_stats_v7 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER,
+            gw INTEGER,
+            season INTEGER,
+            stat_type INTEGER REFERENCES stat_types(code),
+            count INTEGER,
+            division INTEGER DEFAULT 1 REFERENCES divisions(code),
+            FOREIGN KEY(guild_id, user_id) REFERENCES player_stats(guild_id, user_id)
+        )
+    ''')
+    await conn.execute(f'''
+        INSERT INTO player_gw_stats_v7 (id, guild_id, user_id, gw, season, stat_type, count, division)
+        SELECT id, guild_id, user_id, gw, season, {stat_code}, count, {division_code}
+        FROM player_gw_stats
+    ''')
+    await conn.execute('DROP TABLE player_gw_stats')
+    await conn.execute('ALTER TABLE player_gw_stats_v7 RENAME TO player_gw_stats')
+    await conn.execute('CREATE INDEX idx_gw_stats_user_division ON player_gw_stats (guild_id, user_id, division, stat_type, count)')
+    await conn.execute('CREATE INDEX idx_gw_stats_entry ON player_gw_stats (guild_id, user_id, season, gw, stat_type, division)')
+
+    # The composite key is the only lookup path, so the summaries don't need a rowid
+    await conn.execute('''
+        CREATE TABLE season_stats_v7 (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            season INTEGER NOT NULL,
+            division INTEGER NOT NULL REFERENCES divisions(code),
+            stat_type INTEGER NOT NULL REFERENCES stat_types(code),
+            count INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user_id, season, division, stat_type)
+        ) WITHOUT ROWID
+    ''')
+    await conn.execute(f'''
+        INSERT INTO season_stats_v7 (guild_id, user_id, season, division, stat_type, count)
+        SELECT guild_id, user_id, season, {division_code}, {stat_code}, SUM(count)
+        FROM season_stats
+        WHERE {division_code} IS NOT NULL AND {stat_code} IS NOT NULL
+        GROUP BY 1, 2, 3, 4, 5
+    ''')
+    await conn.execute('DROP TABLE season_stats')
+    await conn.execute('ALTER TABLE season_stats_v7 RENAME TO season_stats')
+
+    # Archived raw rows, in this file and in an attached archive file if there is one
+    archives = [("main", "player_gw_stats_archive")]
+    if await _archive_attached(conn):
+        archives.append(("archive", "player_gw_stats"))
+    for schema, table in archives:
+        await conn.execute(f'''
+            CREATE TABLE {schema}.{table}_v7 (
+                id INTEGER PRIMARY KEY,
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER,
+                gw INTEGER,
+                season INTEGER,
+                stat_type INTEGER,
+                count INTEGER,
+                division INTEGER
+            )
+        ''')
+        await conn.execute(f'''
+            INSERT INTO {schema}.{table}_v7 (id, guild_id, user_id, gw, season, stat_type, count, division)
+            SELECT id, guild_id, user_id, gw, season, {stat_code}, count, {division_code}
+            FROM {schema}.{table}
+        ''')
+        await conn.execute(f'DROP TABLE {schema}.{table}')
+        await conn.execute(f'ALTER TABLE {schema}.{table}_v7 RENAME TO {table}')
+
+
+@migration(8, "store point weights in point_weights")
+async def add_point_weights(conn):
+    await conn.execute('''
+        CREATE TABLE point_weights (
+            division INTEGER NOT NULL REFERENCES divisions(code),
+            stat_type INTEGER NOT NULL REFERENCES stat_types(code),
+            points INTEGER NOT NULL,
+            PRIMARY KEY (division, stat_type)
+        ) WITHOUT ROWID
+    ''')
+    await conn.executemany(
+        'INSERT INTO point_weights (division, stat_type, points) VALUES (?, ?, ?)',
+        [
+            (_V7_DIVISION_CODES[division], _V7_STAT_CODES[stat_type], points[i])
+            for stat_type, (_, *points) in _V4_STATS.items()
+            for i, division in enumerate(_V7_DIVISION_CODES)
+        ]
+    )
+
+
+@migration(9, "index GW rows by season for exports", archive=True)
+async def add_season_indexes(conn):
+    # The rowid rides along at the end of each index, so season exports can walk it in id order
+    await conn.execute('CREATE INDEX idx_gw_stats_season ON player_gw_stats (guild_id, season)')
+    await conn.execute('CREATE INDEX idx_gw_archive_season ON player_gw_stats_archive (guild_id, season)')
+    if await _archive_attached(conn):
+        await conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_gw_archive_season ON player_gw_stats (guild_id, season)')
+
+
+@migration(10, "index GW rows by player and gameweek for /history", archive=True)
+async def add_history_indexes(conn):
+    # The trailing rowid makes (gw, id) the index order within a player's season
+    await conn.execute('CREATE INDEX idx_gw_stats_history ON player_gw_stats (guild_id, user_id, season, gw)')
+    await conn.execute('CREATE INDEX idx_gw_archive_history ON player_gw_stats_archive (guild_id, user_id, season, gw)')
+    if await _archive_attached(conn):
+        await conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_gw_archive_history ON player_gw_stats (guild_id, user_id, season, gw)')
+
+
+@migration(11, "store pending sign, transfer and loan offers")
+async def add_pending_offers(conn):
+    # details holds the kind-specific terms (fee, loan length, ...) as JSON
+    await conn.execute('''
+        CREATE TABLE pending_offers (
+            id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            team_role_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            channel_id INTEGER,
+            dm_channel_id INTEGER,
+            message_id INTEGER,
+            details TEXT NOT NULL DEFAULT '{}',
+            expires_at REAL NOT NULL
+        )
+    ''')
+    await conn.execute('CREATE INDEX idx_pending_offers_expiry ON pending_offers (expires_at)')
+
+
+@migration(12, "store each team's role id")
+async def add_team_role_ids(conn):
+    # Filled in by name the first time the bot sees each guild's roles
+    await conn.execute('ALTER TABLE teams ADD COLUMN role_id INTEGER')
+
+
+@migration(13, "persist team rosters for team and division totals")
+async def add_team_members(conn):
+    # Rebuilt from the team roles whenever a guild becomes available
+    await conn.execute('''
+        CREATE TABLE team_members (
+            guild_id INTEGER NOT NULL,
+            role_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, role_id, user_id)
+        ) WITHOUT ROWID
+    ''')
+
+
+@migration(14, "index GW rows by gameweek for Team of the Week")
+async def add_gameweek_index(conn):
+    await conn.execute('CREATE INDEX idx_gw_stats_gameweek ON player_gw_stats (guild_id, season, gw, division, stat_type)')
+
+
+@migration(15, "track bulk role jobs so they can resume after a restart")
+async def add_role_jobs(conn):
+    await conn.execute('''
+        CREATE TABLE role_jobs (
+            id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            label TEXT NOT NULL,
+            channel_id INTEGER,
+            message_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'running',
+            total INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    await conn.execute('CREATE INDEX idx_role_jobs_status ON role_jobs (status)')
+    # One row per role removal; state is 0 pending, 1 done, 2 failed
+    await conn.execute('''
+        CREATE TABLE role_job_ops (
+            job_id INTEGER NOT NULL REFERENCES role_jobs (id),
+            user_id INTEGER NOT NULL,
+            role_id INTEGER NOT NULL,
+            state INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (job_id, user_id, role_id)
+        ) WITHOUT ROWID
+    ''')
+
+
+@migration(16, "record which table each closed season was archived to", archive=True)
+async def add_closed_season_table(conn):
+    await conn.execute("ALTER TABLE closed_seasons ADD COLUMN archive_table TEXT NOT NULL DEFAULT 'player_gw_stats_archive'")
+    # Seasons closed while an archive file was attached went there
+    if await _archive_attached(conn):
+        await conn.execute('''
+            UPDATE closed_seasons SET archive_table = 'archive.player_gw_stats'
+            WHERE EXISTS (
+                SELECT 1 FROM archive.player_gw_stats a
+                WHERE a.guild_id = closed_seasons.guild_id AND a.season = closed_seasons.season
+            )
+        ''')
@@ -0,0 +1,167 @@
+"""Background DM dispatcher for stat update notifications.
+
+Commands hand changes to :meth:`NotificationDispatcher.notify` and return
+immediately. Changes for the same player that arrive within ``window``
+seconds are merged into a single DM, and sends run on a small worker pool.
+A :exc:`discord.RateLimited` pauses every worker for its ``retry_after``
+before the DM is retried. A 429 that still arrives as an
+:exc:`discord.HTTPException` means discord.py's own retries ran out, so the
+workers pause for ``rate_limit_pause`` and the DM goes back on the queue.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+
+import discord
+
+from database import Database
+from scoring import scoring
+from stats import DIVISION_CODES, STAT_NAMES
+
+STAT_EMOJIS = {
+    "goal": "⚽",
+    "assist": "🎯",
+    "defender cleansheet": "🛡️",
+    "goalkeeper cleansheet": "🧤",
+    "totw": "📊",
+    "motm": "⭐"
+}
+
+
+@dataclass
+class StatChange:
+    stat_type: str
+    division: str
+    count: int
+    moderator: discord.abc.User
+
+    @property
+    def points(self) -> int:
+        return scoring.points(self.division, self.stat_type) * self.count
+
+
+class NotificationDispatcher:
+    def __init__(self, database: Database, window: float = 3.0, max_pending: int = 1000, concurrency: int = 4, max_retries: int = 3,
+                 rate_limit_pause: float = 60.0):
+        self.db = database
+        self.window = window
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.rate_limit_pause = rate_limit_pause
+        self._queue = asyncio.Queue(maxsize=max_pending)
+        # (guild_id, user_id) -> (member, [changes]) waiting for their window to close
+        self._pending = {}
+        self._workers = []
+        # Monotonic time sends may resume after a rate limit
+        self._paused_until = 0.0
+
+    def start(self):
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def notify(self, member: discord.Member, change: StatChange) -> bool:
+        """Queue a change for ``member``; returns False if the queue is full and it was dropped."""
+        return self._enqueue(member, [change], time.monotonic() + self.window)
+
+    def _enqueue(self, member: discord.Member, changes: list, due: float) -> bool:
+        # The same user can play in several guilds; each guild's changes get their own DM
+        key = (member.guild.id, member.id)
+        if key in self._pending:
+            self._pending[key][1].extend(changes)
+            return True
+        try:
+            self._queue.put_nowait((key, due))
+        except asyncio.QueueFull:
+            return False
+        self._pending[key] = (member, changes)
+        return True
+
+    def _pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def _worker(self):
+        while True:
+            key, due = await self._queue.get()
+            try:
+                delay = max(due, self._paused_until) - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                member, changes = self._pending.pop(key)
+                await self._send(member, changes)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Failed to send stat notification to {key[1]} in guild {key[0]}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _send(self, member: discord.Member, changes: list):
+        embed = await self._build_embed(member, changes)
+        for attempt in range(self.max_retries + 1):
+            delay = self._paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await member.send(embed=embed)
+                return
+            except discord.Forbidden:
+                return  # Ignore if user has DMs closed
+            except discord.RateLimited as e:
+                if attempt == self.max_retries:
+                    raise
+                self._pause(e.retry_after)
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    raise
+                self._pause(self.rate_limit_pause)
+                pending = self._pending.get((member.guild.id, member.id))
+                if pending:
+                    pending[1][:0] = changes  # Sent before the changes already waiting
+                elif not self._enqueue(member, changes, self._paused_until):
+                    raise
+                return
+
+    async def _build_embed(self, member: discord.Member, changes: list) -> discord.Embed:
+        removed_only = all(change.count < 0 for change in changes)
+        embed = discord.Embed(
+            title="\U0001F514 Stat Update Notification",
+            color=discord.Color.red() if removed_only else discord.Color.purple(),
+            timestamp=discord.utils.utcnow()
+        )
+        moderator = changes[-1].moderator
+        embed.set_author(name=moderator.display_name, icon_url=moderator.display_avatar.url)
+        divisions = list(dict.fromkeys(change.division for change in changes))
+        embed.add_field(name="Stats Updated", value=f"Your stats in **{', '.join(divisions)}** have just been updated.", inline=False)
+        embed.add_field(
+            name="\U0001F4F0 Latest changes",
+            value="\n".join(
+                f"{STAT_EMOJIS.get(change.stat_type, '')} {change.stat_type.capitalize()}: {change.count:+}  (**{change.points:+} pts**)"
+                for change in changes
+            ),
+            inline=False
+        )
+        # Totals are read at send time so they include every merged change
+        for division in divisions:
+            rows = await self.db.fetchall('''
+                SELECT stat_type, SUM(count) as total FROM (
+                    SELECT stat_type, count FROM player_gw_stats WHERE guild_id = ? AND user_id = ? AND division = ?
+                    UNION ALL
+                    SELECT stat_type, count FROM season_stats WHERE guild_id = ? AND user_id = ? AND division = ?
+                )
+                GROUP BY stat_type
+            ''', (member.guild.id, member.id, DIVISION_CODES[division]) * 2)
+            div_stats = {STAT_NAMES.get(row[0]): row[1] for row in rows}
+            embed.add_field(
+                name=f"Your current totals in {division}",
+                value=f"⚽ Goals: {div_stats.get('goal', 0)}\n🎯 Assists: {div_stats.get('assist', 0)}\n🧤 GK Clean Sheets: {div_stats.get('goalkeeper cleansheet', 0)}\n🛡️ Defender Clean Sheets: {div_stats.get('defender cleansheet', 0)}",
+                inline=False
+            )
+        embed.set_footer(text="Use /profile to view your full stat and value changes.")
+        return embed
@@ -0,0 +1,136 @@
+"""Durable sign, transfer and loan offers.
+
+An offer is a row in ``pending_offers`` from the moment it is sent until the
+player answers it or it expires, so offers survive restarts and nothing is
+kept in memory per offer. The DM's buttons carry the offer id in their
+custom_id and are handled by one button class registered at startup. A
+single task sleeps until the earliest deadline and clears expired offers.
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+
+from database import Database
+from writer import WriteCoalescer
+
+# How long a player has to answer, in seconds
+OFFER_TTL = 180
+
+_COLUMNS = 'id, kind, guild_id, user_id, team_role_id, moderator_id, channel_id, dm_channel_id, message_id, expires_at, details'
+
+
+@dataclass
+class Offer:
+    id: int
+    kind: str
+    guild_id: int
+    user_id: int
+    team_role_id: int
+    moderator_id: int
+    channel_id: int
+    dm_channel_id: int
+    message_id: int
+    expires_at: float
+    details: dict
+
+    @classmethod
+    def from_row(cls, row) -> "Offer":
+        return cls(*row[:-1], json.loads(row[-1]))
+
+
+class OfferStore:
+    def __init__(self, database: Database, writer: WriteCoalescer, ttl: float = OFFER_TTL):
+        self.db = database
+        self.writer = writer
+        self.ttl = ttl
+        self._wake = asyncio.Event()
+        self._task = None
+
+    async def create(self, kind: str, guild_id: int, user_id: int, team_role_id: int, moderator_id: int, channel_id: int, details: dict) -> int:
+        """Store a new offer and return its id."""
+        async def insert(conn):
+            cursor = await conn.execute('''
+                INSERT INTO pending_offers (kind, guild_id, user_id, team_role_id, moderator_id, channel_id, details, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (kind, guild_id, user_id, team_role_id, moderator_id, channel_id, json.dumps(details), time.time() + self.ttl))
+            return cursor.lastrowid
+        offer_id = await self.writer.submit(insert)
+        self._wake.set()
+        return offer_id
+
+    async def attach_message(self, offer_id: int, dm_channel_id: int, message_id: int):
+        """Remember which DM carries the offer, so its buttons can be removed when it expires."""
+        async def update(conn):
+            await conn.execute(
+                'UPDATE pending_offers SET dm_channel_id = ?, message_id = ? WHERE id = ?',
+                (dm_channel_id, message_id, offer_id)
+            )
+        await self.writer.submit(update)
+
+    async def claim(self, offer_id: int) -> Offer:
+        """Remove and return an unexpired offer, or None if it expired or was already answered.
+
+        The delete is the claim, so a double click can't accept an offer twice.
+        """
+        async def take(conn):
+            async with conn.execute(f'''
+                DELETE FROM pending_offers WHERE id = ? AND expires_at > ? RETURNING {_COLUMNS}
+            ''', (offer_id, time.time())) as cursor:
+                return await cursor.fetchall()
+        rows = await self.writer.submit(take)
+        return Offer.from_row(rows[0]) if rows else None
+
+    async def restore(self, offer: Offer):
+        """Put back an offer that was claimed but couldn't be carried out, keeping its deadline."""
+        async def insert(conn):
+            await conn.execute(f'''
+                INSERT INTO pending_offers ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                offer.id, offer.kind, offer.guild_id, offer.user_id, offer.team_role_id, offer.moderator_id,
+                offer.channel_id, offer.dm_channel_id, offer.message_id, offer.expires_at, json.dumps(offer.details)
+            ))
+        await self.writer.submit(insert)
+        self._wake.set()
+
+    async def cancel(self, offer_id: int):
+        async def delete(conn):
+            await conn.execute('DELETE FROM pending_offers WHERE id = ?', (offer_id,))
+        await self.writer.submit(delete)
+
+    async def _expire_due(self) -> list:
+        async def take(conn):
+            async with conn.execute(f'''
+                DELETE FROM pending_offers WHERE expires_at <= ? RETURNING {_COLUMNS}
+            ''', (time.time(),)) as cursor:
+                return await cursor.fetchall()
+        return [Offer.from_row(row) for row in await self.writer.submit(take)]
+
+    def start(self, on_expire):
+        """Run the expiry task; ``on_expire(offer)`` is awaited for each offer that times out."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(on_expire))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, on_expire):
+        while True:
+            # Cleared before reading the deadline so an offer created meanwhile still wakes us
+            self._wake.clear()
+            row = await self.db.fetchone('SELECT MIN(expires_at) FROM pending_offers')
+            delay = row[0] - time.time() if row[0] is not None else None
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            for offer in await self._expire_due():
+                try:
+                    await on_expire(offer)
+                except Exception as e:
+                    print(f"Failed to expire offer {offer.id}: {e}")
@@ -0,0 +1,82 @@
+"""LRU cache of /profile data with per-player versions.
+
+Entries are keyed by ``(guild_id, user_id)``. Every write that changes a
+player's profile calls :meth:`ProfileCache.bump`, which drops the cached
+entry and advances the player's version. A load that was already running
+when the bump happened still answers its own callers, but its result is
+not cached. Concurrent requests for the same player and version share one
+load instead of each querying the database.
+"""
+import asyncio
+from collections import OrderedDict
+
+
+class ProfileCache:
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Versions are only tracked while a load is in flight; nothing else can go stale
+        self._versions = {}
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: tuple, loader):
+        """Return the cached value for ``key``, or await ``loader()`` once for all concurrent callers."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        version = self._versions.get(key, 0)
+        flight = self._inflight.get(key)
+        if flight is not None and flight[0] == version:
+            self.coalesced += 1
+            return await asyncio.shield(flight[1])
+
+        self.misses += 1
+        self._versions[key] = version
+        task = asyncio.ensure_future(loader())
+        self._inflight[key] = (version, task)
+        try:
+            # Shielded so a cancelled caller doesn't cancel the load others are waiting on
+            value = await asyncio.shield(task)
+        finally:
+            if self._inflight.get(key, (None, None))[1] is task:
+                del self._inflight[key]
+                fresh = self._versions.pop(key, None) == version
+            else:
+                fresh = False
+        if fresh:
+            self._store(key, value)
+        return value
+
+    def _store(self, key: tuple, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def bump(self, guild_id: int, user_id: int):
+        """Invalidate one player's profile after a change to their stats or position."""
+        key = (guild_id, user_id)
+        self._entries.pop(key, None)
+        if key in self._versions:
+            self._versions[key] += 1
+
+    def bump_guild(self, guild_id: int = None):
+        """Invalidate every profile in a guild, or in every guild when ``guild_id`` is None."""
+        for key in [key for key in self._entries if guild_id is None or key[0] == guild_id]:
+            del self._entries[key]
+        for key in self._versions:
+            if guild_id is None or key[0] == guild_id:
+                self._versions[key] += 1
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses + self.coalesced
+        return (self.hits + self.coalesced) / lookups if lookups else 0.0
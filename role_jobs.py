@@ -0,0 +1,202 @@
+"""Resumable bulk role removals for /releaseteam and /resetseason.
+
+A job's full list of role removals is stored in ``role_job_ops`` before
+any role is touched. A small worker pool then applies them and marks each
+one as it lands. A job that was still running when the process stopped
+carries on from its pending removals at the next start. Workers share a
+per-guild pause, so a rate limit on one removal holds back the others
+aimed at the same route instead of each of them hitting it in turn.
+
+discord.py raises :exc:`discord.RateLimited` when a route is limited for
+longer than the client's ``max_ratelimit_timeout``; the guild is paused for
+its ``retry_after`` and the removal retried. A 429 that still arrives as an
+:exc:`discord.HTTPException` means discord.py's own retries ran out, so the
+guild is paused for ``rate_limit_pause`` and the removal goes back on the
+queue instead of being retried straight away.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+
+import discord
+
+from database import Database
+from writer import WriteCoalescer
+
+PENDING, DONE, FAILED = 0, 1, 2
+
+
+@dataclass
+class RoleJob:
+    id: int
+    guild_id: int
+    kind: str
+    label: str
+    channel_id: int
+    message_id: int
+    status: str
+    total: int
+    done: int = 0
+    failed: int = 0
+
+
+class RoleJobs:
+    def __init__(self, database: Database, writer: WriteCoalescer, concurrency: int = 4, max_retries: int = 3, report_interval: float = 2.0,
+                 rate_limit_pause: float = 60.0):
+        self.db = database
+        self.writer = writer
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.report_interval = report_interval
+        self.rate_limit_pause = rate_limit_pause
+        # job_id -> (job, task), for jobs running in this process
+        self._tasks = {}
+        # Guilds claimed by reserve() whose job hasn't been started yet
+        self._reserved = set()
+        # guild_id -> monotonic time role edits in that guild may resume
+        self._paused_until = {}
+
+    def running(self, guild_id: int) -> bool:
+        return guild_id in self._reserved or any(job.guild_id == guild_id for job, _ in self._tasks.values())
+
+    def reserve(self, guild_id: int) -> bool:
+        """Claim the guild for a new job; False if it already has one.
+
+        Call it before the first await, so two commands can't both pass the
+        check. The claim ends when the job is started or :meth:`release` is called.
+        """
+        if self.running(guild_id):
+            return False
+        self._reserved.add(guild_id)
+        return True
+
+    def release(self, guild_id: int):
+        self._reserved.discard(guild_id)
+
+    async def create(self, guild_id: int, kind: str, label: str, memberships: list, channel_id: int = None) -> RoleJob:
+        """Store a job and every ``(role_id, user_id)`` removal it will make."""
+        async with self.db.transaction() as conn:
+            cursor = await conn.execute(
+                'INSERT INTO role_jobs (guild_id, kind, label, channel_id, total) VALUES (?, ?, ?, ?, ?)',
+                (guild_id, kind, label, channel_id, len(memberships))
+            )
+            job_id = cursor.lastrowid
+            await conn.executemany(
+                'INSERT OR IGNORE INTO role_job_ops (job_id, user_id, role_id) VALUES (?, ?, ?)',
+                [(job_id, user_id, role_id) for role_id, user_id in memberships]
+            )
+        return RoleJob(job_id, guild_id, kind, label, channel_id, None, "running", len(memberships))
+
+    async def set_message(self, job: RoleJob, message_id: int):
+        """Remember the progress message so a resumed job keeps editing it."""
+        job.message_id = message_id
+        async def update(conn):
+            await conn.execute('UPDATE role_jobs SET message_id = ? WHERE id = ?', (message_id, job.id))
+        await self.writer.submit(update)
+
+    def start(self, job: RoleJob, remove, report):
+        """Run ``job`` in the background.
+
+        ``remove(guild_id, user_id, role_id)`` makes one removal and
+        ``report(job)`` publishes progress.
+        """
+        task = asyncio.create_task(self._run(job, remove, report))
+        self._tasks[job.id] = (job, task)
+        self._reserved.discard(job.guild_id)
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+
+    async def resume(self, remove, report) -> int:
+        """Restart every job that was still running when the process stopped."""
+        rows = await self.db.fetchall('''
+            SELECT id, guild_id, kind, label, channel_id, message_id, status, total
+            FROM role_jobs WHERE status = 'running'
+        ''')
+        for row in rows:
+            job = RoleJob(*row)
+            counts = dict(await self.db.fetchall(
+                'SELECT state, COUNT(*) FROM role_job_ops WHERE job_id = ? GROUP BY state', (job.id,)
+            ))
+            job.done, job.failed = counts.get(DONE, 0), counts.get(FAILED, 0)
+            self.start(job, remove, report)
+        return len(rows)
+
+    async def stop(self):
+        tasks = [task for _, task in self._tasks.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job: RoleJob, remove, report):
+        pending = await self.db.fetchall(
+            'SELECT user_id, role_id FROM role_job_ops WHERE job_id = ? AND state = ?', (job.id, PENDING)
+        )
+        queue = asyncio.Queue()
+        for op in pending:
+            queue.put_nowait(op)
+        reporter = asyncio.create_task(self._report_periodically(job, report))
+        try:
+            await asyncio.gather(*(self._worker(job, queue, remove) for _ in range(min(self.concurrency, len(pending)))))
+        finally:
+            reporter.cancel()
+        job.status = "done"
+        async def finish(conn):
+            await conn.execute(
+                'UPDATE role_jobs SET status = ?, done = ?, failed = ? WHERE id = ?',
+                (job.status, job.done, job.failed, job.id)
+            )
+            await conn.execute('DELETE FROM role_job_ops WHERE job_id = ?', (job.id,))
+        await self.writer.submit(finish)
+        await self._report(job, report)
+
+    async def _worker(self, job: RoleJob, queue: asyncio.Queue, remove):
+        while not queue.empty():
+            user_id, role_id = queue.get_nowait()
+            state = await self._apply(job.guild_id, user_id, role_id, remove)
+            if state == PENDING:
+                queue.put_nowait((user_id, role_id))
+                continue
+            async def mark(conn):
+                await conn.execute(
+                    'UPDATE role_job_ops SET state = ? WHERE job_id = ? AND user_id = ? AND role_id = ?',
+                    (state, job.id, user_id, role_id)
+                )
+            await self.writer.submit(mark)
+            if state == DONE:
+                job.done += 1
+            else:
+                job.failed += 1
+
+    def _pause(self, guild_id: int, seconds: float):
+        self._paused_until[guild_id] = max(self._paused_until.get(guild_id, 0), time.monotonic() + seconds)
+
+    async def _apply(self, guild_id: int, user_id: int, role_id: int, remove) -> int:
+        """Remove one role; PENDING means it was rate limited and should be queued again."""
+        for _ in range(self.max_retries + 1):
+            delay = self._paused_until.get(guild_id, 0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await remove(guild_id, user_id, role_id)
+                return DONE
+            except discord.NotFound:
+                return DONE  # The member left or the role is gone, so there is nothing to remove
+            except discord.RateLimited as e:
+                self._pause(guild_id, e.retry_after)
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    self._pause(guild_id, self.rate_limit_pause)
+                    return PENDING
+                print(f"Failed to remove role {role_id} from {user_id} in guild {guild_id}: {e}")
+                return FAILED
+        return PENDING
+
+    async def _report_periodically(self, job: RoleJob, report):
+        while True:
+            await self._report(job, report)
+            await asyncio.sleep(self.report_interval)
+
+    async def _report(self, job: RoleJob, report):
+        try:
+            await report(job)
+        except Exception as e:
+            print(f"Failed to report progress of role job {job.id}: {e}")
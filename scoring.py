@@ -0,0 +1,66 @@
+"""Point weights and rank thresholds.
+
+The weights live in the ``point_weights`` table, keyed by division and stat
+type codes, so queries can join against it to compute points in SQL. The
+same table is cached in memory for the per-write paths, which only need
+one weight at a time. Names are resolved through the ``divisions`` and
+``stat_types`` lookup tables.
+"""
+from database import Database
+
+# Weights a fresh database is seeded with (migration 8 keeps its own copy)
+DEFAULT_POINTS = {
+    "Div 1": {"goal": 9, "assist": 7, "defender cleansheet": 10, "goalkeeper cleansheet": 12, "motm": 8, "totw": 8},
+    "Div 2": {"goal": 6, "assist": 5, "defender cleansheet": 8, "goalkeeper cleansheet": 10, "motm": 6, "totw": 6},
+    "Div 3": {"goal": 3, "assist": 2, "defender cleansheet": 6, "goalkeeper cleansheet": 8, "motm": 3, "totw": 3}
+}
+
+# (minimum points, rank), highest first
+RANKS = [
+    (300, "🔶 Platinum"),
+    (194, "🟡 Gold"),
+    (84, "⚪ Silver"),
+    (0, "🟤 Bronze"),
+]
+
+
+def rank_for(points: int) -> str:
+    for minimum, rank in RANKS:
+        if points >= minimum:
+            return rank
+    return RANKS[-1][1]
+
+
+class Scoring:
+    def __init__(self):
+        self._points = {division: dict(weights) for division, weights in DEFAULT_POINTS.items()}
+
+    async def load(self, database: Database):
+        rows = await database.fetchall('''
+            /* full scan */
+            SELECT d.name, s.name, w.points
+            FROM point_weights w
+            JOIN divisions d ON d.code = w.division
+            JOIN stat_types s ON s.code = w.stat_type
+        ''')
+        for division, stat_type, points in rows:
+            self._points.setdefault(division, {})[stat_type] = points
+
+    def points(self, division: str, stat_type: str) -> int:
+        return self._points[division][stat_type]
+
+    async def set_points(self, database: Database, division: str, stat_type: str, points: int, on_write=None):
+        """Store a new weight; ``on_write(conn)`` runs in the same transaction, e.g. to recompute totals."""
+        async with database.transaction() as conn:
+            await conn.execute('''
+                UPDATE point_weights SET points = ?
+                WHERE division = (SELECT code FROM divisions WHERE name = ?)
+                  AND stat_type = (SELECT code FROM stat_types WHERE name = ?)
+            ''', (points, division, stat_type))
+            if on_write is not None:
+                await on_write(conn)
+        # Only reached once the commit succeeded
+        self._points[division][stat_type] = points
+
+
+scoring = Scoring()
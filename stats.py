@@ -0,0 +1,114 @@
+"""Per-player aggregate maintenance for the ``player_stats`` table.
+
+``player_gw_stats`` is the source of truth: one row per logged stat. The
+totals on ``player_stats`` are kept in step with it inside the same
+transaction as every write, so reads never need to aggregate the GW rows.
+Every row belongs to one guild, so each function takes the ``guild_id``.
+
+Stat types and divisions are stored as the small integer codes below, and
+are turned back into names at the edge.
+"""
+import aiosqlite
+
+from scoring import scoring
+
+# Stat type -> player_stats total column
+STAT_COLUMNS = {
+    "goal": "goals",
+    "assist": "assists",
+    "defender cleansheet": "cleansheets_defender",
+    "goalkeeper cleansheet": "cleansheets_goalkeeper",
+    "motm": "motm",
+    "totw": "totw",
+}
+
+# Division -> player_stats points column
+POINTS_COLUMNS = {
+    "Div 1": "points_div1",
+    "Div 2": "points_div2",
+    "Div 3": "points_div3",
+}
+
+# Positions a player can be listed at
+POSITIONS = ["GK", "DEF", "MID", "FWD"]
+
+# Stored codes; these match the stat_types and divisions lookup tables and must never change
+STAT_CODES = {
+    "goal": 1,
+    "assist": 2,
+    "defender cleansheet": 3,
+    "goalkeeper cleansheet": 4,
+    "motm": 5,
+    "totw": 6,
+}
+DIVISION_CODES = {
+    "Div 1": 1,
+    "Div 2": 2,
+    "Div 3": 3,
+}
+STAT_NAMES = {code: name for name, code in STAT_CODES.items()}
+DIVISION_NAMES = {code: name for name, code in DIVISION_CODES.items()}
+
+
+async def apply_stat_delta(conn: aiosqlite.Connection, guild_id: int, user_id: int, stat_type: str, division: str, delta: int):
+    """Shift a player's totals by ``delta`` of ``stat_type`` in ``division``."""
+    stat_column = STAT_COLUMNS[stat_type]
+    points_column = POINTS_COLUMNS[division]
+    points = scoring.points(division, stat_type) * delta
+    await conn.execute('INSERT OR IGNORE INTO player_stats (guild_id, user_id) VALUES (?, ?)', (guild_id, user_id))
+    await conn.execute(
+        f'UPDATE player_stats SET {stat_column} = {stat_column} + ?, {points_column} = {points_column} + ? WHERE guild_id = ? AND user_id = ?',
+        (delta, points, guild_id, user_id)
+    )
+
+
+async def apply_stat_deltas(conn: aiosqlite.Connection, guild_id: int, deltas: list):
+    """Apply many ``(user_id, stat_type, division, delta)`` changes, one UPDATE per player."""
+    columns = list(STAT_COLUMNS.values()) + list(POINTS_COLUMNS.values())
+    totals = {}
+    for user_id, stat_type, division, delta in deltas:
+        player = totals.setdefault(user_id, dict.fromkeys(columns, 0))
+        player[STAT_COLUMNS[stat_type]] += delta
+        player[POINTS_COLUMNS[division]] += scoring.points(division, stat_type) * delta
+    await conn.executemany('INSERT OR IGNORE INTO player_stats (guild_id, user_id) VALUES (?, ?)', [(guild_id, u) for u in totals])
+    await conn.executemany(
+        f"UPDATE player_stats SET {', '.join(f'{c} = {c} + ?' for c in columns)} WHERE guild_id = ? AND user_id = ?",
+        [tuple(player[c] for c in columns) + (guild_id, user_id) for user_id, player in totals.items()]
+    )
+
+
+async def rebuild_aggregates(conn: aiosqlite.Connection, guild_id: int) -> int:
+    """Recompute a guild's totals; return players updated.
+
+    Open seasons are summed from the raw GW rows and closed seasons from
+    ``season_stats``, and points come from joining ``point_weights``.
+    """
+    async with conn.execute('''
+        SELECT t.user_id, t.stat_type, t.division, SUM(t.count), SUM(t.count * w.points) FROM (
+            SELECT user_id, stat_type, division, count FROM player_gw_stats WHERE guild_id = ?
+            UNION ALL
+            SELECT user_id, stat_type, division, count FROM season_stats WHERE guild_id = ?
+        ) t
+        JOIN point_weights w ON w.division = t.division AND w.stat_type = t.stat_type
+        GROUP BY t.user_id, t.stat_type, t.division
+    ''', (guild_id, guild_id)) as cursor:
+        grouped = await cursor.fetchall()
+
+    columns = list(STAT_COLUMNS.values()) + list(POINTS_COLUMNS.values())
+    totals = {}
+    for user_id, stat_code, division_code, total, points in grouped:
+        stat_type = STAT_NAMES.get(stat_code)
+        division = DIVISION_NAMES.get(division_code)
+        if stat_type is None or division is None:
+            continue
+        player = totals.setdefault(user_id, dict.fromkeys(columns, 0))
+        player[STAT_COLUMNS[stat_type]] += total
+        player[POINTS_COLUMNS[division]] += points
+
+    await conn.execute(f"UPDATE player_stats SET {', '.join(f'{c} = 0' for c in columns)} WHERE guild_id = ?", (guild_id,))
+    await conn.executemany('INSERT OR IGNORE INTO player_stats (guild_id, user_id) VALUES (?, ?)', [(guild_id, u) for u in totals])
+    await conn.executemany(
+        f"UPDATE player_stats SET {', '.join(f'{c} = ?' for c in columns)} WHERE guild_id = ? AND user_id = ?",
+        [tuple(player[c] for c in columns) + (guild_id, user_id) for user_id, player in totals.items()]
+    )
+    return len(totals)
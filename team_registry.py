@@ -0,0 +1,228 @@
+"""In-memory registry of each guild's teams and who plays for them.
+
+Teams are loaded from the ``teams`` table at startup and bound to their
+roles once a guild's members and roles are available. After that, role and
+member gateway events keep the registry current, so commands can answer
+"which team is this", "who is on it" and "what team is this player on"
+without walking the guild's roles or members.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+
+from autocomplete import MAX_CHOICES, PrefixIndex
+from database import Database
+
+
+@dataclass(eq=False)
+class Team:
+    name: str
+    division: str
+    role_id: int = None
+    member_ids: set = field(default_factory=set)
+
+
+class TeamRegistry:
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        # guild_id -> {lowercased name: Team}
+        self._teams = {}
+        # guild_id -> {role_id: Team}, only for teams whose role exists
+        self._roles = {}
+        # guild_id -> {user_id: {role_id}}
+        self._member_teams = {}
+        # guild_id -> PrefixIndex of names of teams whose role exists
+        self._indexes = {}
+        # guild_id -> Counter of teams per division
+        self._divisions = {}
+        # guild_id -> Counter of lowercased names of every role in the guild
+        self._role_names = {}
+
+    async def load(self, database: Database):
+        rows = await database.fetchall('/* full scan */ SELECT guild_id, team_name, division, role_id FROM teams')
+        self._reset()
+        for guild_id, team_name, division, role_id in rows:
+            self._teams.setdefault(guild_id, {})[team_name.lower()] = Team(team_name, division, role_id)
+            self._divisions.setdefault(guild_id, Counter())[division] += 1
+
+    def bind_guild(self, guild) -> list:
+        """Match the guild's teams to its roles and index their members.
+
+        Returns ``(team_name, role_id)`` for every team whose stored role id
+        changed, so the caller can persist it.
+        """
+        guild_teams = self._teams.get(guild.id, {})
+        roles_by_name = {role.name: role for role in guild.roles}
+        changed = []
+        self._role_names[guild.id] = Counter(role.name.lower() for role in guild.roles)
+        self._roles[guild.id] = {}
+        self._member_teams[guild.id] = {}
+        self._indexes[guild.id] = PrefixIndex()
+        for team in guild_teams.values():
+            team.member_ids = set()
+            role = guild.get_role(team.role_id) if team.role_id else None
+            if role is None:
+                # Teams registered before role ids were stored, or whose role was recreated
+                role = roles_by_name.get(team.name)
+                if role is None:
+                    continue
+                team.role_id = role.id
+                changed.append((team.name, role.id))
+            self._bind(guild.id, team)
+        team_roles = self._roles[guild.id]
+        for member in guild.members:
+            for role in member.roles:
+                if role.id in team_roles:
+                    self._join(guild.id, member.id, role.id)
+        return changed
+
+    def forget_guild(self, guild_id: int):
+        """Drop a guild's roles and members; its teams stay loaded for when it comes back."""
+        for team in self._teams.get(guild_id, {}).values():
+            team.member_ids = set()
+        self._roles.pop(guild_id, None)
+        self._member_teams.pop(guild_id, None)
+        self._indexes.pop(guild_id, None)
+        self._role_names.pop(guild_id, None)
+
+    def _bind(self, guild_id: int, team: Team):
+        self._roles.setdefault(guild_id, {})[team.role_id] = team
+        self._indexes.setdefault(guild_id, PrefixIndex()).add(team.name)
+
+    def _join(self, guild_id: int, user_id: int, role_id: int):
+        self._roles[guild_id][role_id].member_ids.add(user_id)
+        self._member_teams.setdefault(guild_id, {}).setdefault(user_id, set()).add(role_id)
+
+    def _leave(self, guild_id: int, user_id: int, role_id: int):
+        team = self._roles.get(guild_id, {}).get(role_id)
+        if team is not None:
+            team.member_ids.discard(user_id)
+        member_teams = self._member_teams.get(guild_id, {})
+        if user_id in member_teams:
+            member_teams[user_id].discard(role_id)
+            if not member_teams[user_id]:
+                del member_teams[user_id]
+
+    def add(self, guild_id: int, team_name: str, division: str, role_id: int = None) -> Team:
+        team = Team(team_name, division, role_id)
+        self._teams.setdefault(guild_id, {})[team_name.lower()] = team
+        self._divisions.setdefault(guild_id, Counter())[division] += 1
+        if role_id is not None:
+            self._bind(guild_id, team)
+        return team
+
+    def remove(self, guild_id: int, team_name: str) -> Team:
+        """Forget a team and its role; returns the team, or None if it wasn't registered.
+
+        Only the command benchmark calls this, to delete and recreate teams
+        in memory without going through Discord.
+        """
+        team = self._teams.get(guild_id, {}).pop(team_name.strip().lower(), None)
+        if team is None:
+            return None
+        self._divisions[guild_id][team.division] -= 1
+        if self.by_role(guild_id, team.role_id) is team:
+            self._unbind(guild_id, team.role_id)
+        return team
+
+    def role_created(self, role) -> Team:
+        """Bind a registered team that has no role to a new role with its name; returns the team."""
+        self._role_names.setdefault(role.guild.id, Counter())[role.name.lower()] += 1
+        team = self._teams.get(role.guild.id, {}).get(role.name.lower())
+        if team is None or team.name != role.name or team.role_id in self._roles.get(role.guild.id, {}):
+            return None
+        team.role_id = role.id
+        self._bind(role.guild.id, team)
+        return team
+
+    def role_name_changed(self, guild_id: int, old_name: str, new_name: str):
+        """Track any role's rename, team or not."""
+        names = self._role_names.setdefault(guild_id, Counter())
+        names[old_name.lower()] -= 1
+        names[new_name.lower()] += 1
+
+    def role_renamed(self, role, old_name: str) -> Team:
+        """Follow a team role's rename; returns the team, or None if the role isn't a team."""
+        team = self.by_role(role.guild.id, role.id)
+        if team is None:
+            return None
+        guild_teams = self._teams[role.guild.id]
+        del guild_teams[old_name.lower()]
+        self._indexes[role.guild.id].remove(old_name)
+        team.name = role.name
+        guild_teams[role.name.lower()] = team
+        self._indexes[role.guild.id].add(role.name)
+        return team
+
+    def role_deleted(self, role) -> Team:
+        """Unbind a deleted team role; returns the team, or None if the role wasn't a team."""
+        self._role_names.setdefault(role.guild.id, Counter())[role.name.lower()] -= 1
+        # The team stays registered so recreating a role with its name brings it back
+        return self._unbind(role.guild.id, role.id)
+
+    def _unbind(self, guild_id: int, role_id: int) -> Team:
+        team = self._roles.get(guild_id, {}).get(role_id)
+        if team is None:
+            return None
+        self._indexes[guild_id].remove(team.name)
+        for user_id in list(team.member_ids):
+            self._leave(guild_id, user_id, role_id)
+        del self._roles[guild_id][role_id]
+        return team
+
+    def member_updated(self, before, after) -> tuple:
+        """Apply a member's role changes; returns the team role ids ``(joined, left)``."""
+        team_roles = self._roles.get(after.guild.id)
+        if not team_roles:
+            return (), ()
+        before_ids = {role.id for role in before.roles if role.id in team_roles}
+        after_ids = {role.id for role in after.roles if role.id in team_roles}
+        joined, left = after_ids - before_ids, before_ids - after_ids
+        for role_id in joined:
+            self._join(after.guild.id, after.id, role_id)
+        for role_id in left:
+            self._leave(after.guild.id, after.id, role_id)
+        return joined, left
+
+    def member_removed(self, guild_id: int, user_id: int) -> list:
+        """Drop a member who left the guild; returns the team role ids they held."""
+        left = list(self._member_teams.get(guild_id, {}).get(user_id, ()))
+        for role_id in left:
+            self._leave(guild_id, user_id, role_id)
+        return left
+
+    def memberships(self, guild_id: int) -> list:
+        """Every ``(role_id, user_id)`` pair in the guild."""
+        return [(role_id, user_id) for user_id, role_ids in self._member_teams.get(guild_id, {}).items() for role_id in role_ids]
+
+    def lookup(self, guild_id: int, team_name: str) -> Team:
+        """The team registered as ``team_name`` (any case) whose role exists, or None."""
+        team = self._teams.get(guild_id, {}).get(team_name.strip().lower())
+        return team if team is not None and team.role_id in self._roles.get(guild_id, {}) else None
+
+    def is_registered(self, guild_id: int, team_name: str) -> bool:
+        return team_name.strip().lower() in self._teams.get(guild_id, {})
+
+    def role_name_taken(self, guild_id: int, name: str) -> bool:
+        """Whether any role in the guild, team or not, is called ``name`` (any case)."""
+        return self._role_names.get(guild_id, Counter())[name.strip().lower()] > 0
+
+    def by_role(self, guild_id: int, role_id: int) -> Team:
+        return self._roles.get(guild_id, {}).get(role_id)
+
+    def teams_of(self, guild_id: int, user_id: int) -> list:
+        """Teams the player currently holds the role of."""
+        team_roles = self._roles.get(guild_id, {})
+        return [team_roles[role_id] for role_id in self._member_teams.get(guild_id, {}).get(user_id, ())]
+
+    def in_division(self, guild_id: int, division: str) -> list:
+        """The division's teams whose role exists."""
+        return [team for team in self._roles.get(guild_id, {}).values() if team.division == division]
+
+    def count(self, guild_id: int, division: str) -> int:
+        return self._divisions.get(guild_id, Counter())[division]
+
+    def search(self, guild_id: int, query: str, limit: int = MAX_CHOICES) -> list:
+        index = self._indexes.get(guild_id)
+        return index.search(query, limit) if index else []
@@ -0,0 +1,109 @@
+"""Team and division totals for /teamstats and /standings.
+
+Rosters are persisted in ``team_members`` from the team registry, so a
+team's totals are one grouped query joining its current players' stat rows.
+Closed seasons are read from their summaries. Results are cached per guild,
+season and gameweek, and a guild's entries are dropped whenever its stats
+or rosters change.
+"""
+from database import Database
+from stats import STAT_NAMES
+
+
+async def replace_members(conn, guild_id: int, memberships):
+    """Replace a guild's stored rosters with ``(role_id, user_id)`` pairs."""
+    await conn.execute('DELETE FROM team_members WHERE guild_id = ?', (guild_id,))
+    await conn.executemany(
+        'INSERT INTO team_members (guild_id, role_id, user_id) VALUES (?, ?, ?)',
+        [(guild_id, role_id, user_id) for role_id, user_id in memberships]
+    )
+
+
+async def add_members(conn, guild_id: int, memberships):
+    await conn.executemany(
+        'INSERT OR IGNORE INTO team_members (guild_id, role_id, user_id) VALUES (?, ?, ?)',
+        [(guild_id, role_id, user_id) for role_id, user_id in memberships]
+    )
+
+
+async def remove_members(conn, guild_id: int, memberships):
+    await conn.executemany(
+        'DELETE FROM team_members WHERE guild_id = ? AND role_id = ? AND user_id = ?',
+        [(guild_id, role_id, user_id) for role_id, user_id in memberships]
+    )
+
+
+async def remove_team(conn, guild_id: int, role_id: int):
+    await conn.execute('DELETE FROM team_members WHERE guild_id = ? AND role_id = ?', (guild_id, role_id))
+
+
+class TeamStats:
+    def __init__(self):
+        # guild_id -> {(kind, key, season, gw): totals}
+        self._cache = {}
+
+    def invalidate(self, guild_id: int = None):
+        """Drop a guild's cached totals, or every guild's when ``guild_id`` is None."""
+        if guild_id is None:
+            self._cache = {}
+        else:
+            self._cache.pop(guild_id, None)
+
+    async def team(self, database: Database, guild_id: int, role_id: int, season: int, gw: int) -> tuple:
+        """Return ``({stat_type: count}, points)`` for a team's current players in ``season``."""
+        key = ("team", role_id, season, gw)
+        cached = self._cache.get(guild_id, {}).get(key)
+        if cached is not None:
+            return cached
+        # CROSS JOIN pins the join order: start from the roster, not from every row in the season
+        rows = await database.fetchall('''
+            SELECT stat_type, SUM(count), SUM(points) FROM (
+                SELECT g.stat_type, g.count, g.count * w.points AS points
+                FROM team_members m
+                CROSS JOIN player_gw_stats g ON g.guild_id = m.guild_id AND g.user_id = m.user_id AND g.season = ?
+                JOIN point_weights w ON w.division = g.division AND w.stat_type = g.stat_type
+                WHERE m.guild_id = ? AND m.role_id = ?
+                UNION ALL
+                SELECT s.stat_type, s.count, s.count * w.points
+                FROM team_members m
+                CROSS JOIN season_stats s ON s.guild_id = m.guild_id AND s.user_id = m.user_id AND s.season = ?
+                JOIN point_weights w ON w.division = s.division AND w.stat_type = s.stat_type
+                WHERE m.guild_id = ? AND m.role_id = ?
+            )
+            GROUP BY stat_type
+        ''', (season, guild_id, role_id) * 2)
+        totals = ({STAT_NAMES[stat_code]: count for stat_code, count, _ in rows}, sum(points for _, _, points in rows))
+        self._cache.setdefault(guild_id, {})[key] = totals
+        return totals
+
+    async def division(self, database: Database, guild_id: int, division: str, season: int, gw: int) -> dict:
+        """Return ``{role_id: ({stat_type: count}, points)}`` for the division's teams that have stats."""
+        key = ("division", division, season, gw)
+        cached = self._cache.get(guild_id, {}).get(key)
+        if cached is not None:
+            return cached
+        rows = await database.fetchall('''
+            SELECT role_id, stat_type, SUM(count), SUM(points) FROM (
+                SELECT m.role_id, g.stat_type, g.count, g.count * w.points AS points
+                FROM teams t
+                CROSS JOIN team_members m ON m.guild_id = t.guild_id AND m.role_id = t.role_id
+                CROSS JOIN player_gw_stats g ON g.guild_id = m.guild_id AND g.user_id = m.user_id AND g.season = ?
+                JOIN point_weights w ON w.division = g.division AND w.stat_type = g.stat_type
+                WHERE t.guild_id = ? AND t.division = ?
+                UNION ALL
+                SELECT m.role_id, s.stat_type, s.count, s.count * w.points
+                FROM teams t
+                CROSS JOIN team_members m ON m.guild_id = t.guild_id AND m.role_id = t.role_id
+                CROSS JOIN season_stats s ON s.guild_id = m.guild_id AND s.user_id = m.user_id AND s.season = ?
+                JOIN point_weights w ON w.division = s.division AND w.stat_type = s.stat_type
+                WHERE t.guild_id = ? AND t.division = ?
+            )
+            GROUP BY role_id, stat_type
+        ''', (season, guild_id, division) * 2)
+        totals = {}
+        for role_id, stat_code, count, points in rows:
+            stats, total = totals.get(role_id, ({}, 0))
+            stats[STAT_NAMES[stat_code]] = count
+            totals[role_id] = (stats, total + points)
+        self._cache.setdefault(guild_id, {})[key] = totals
+        return totals
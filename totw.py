@@ -0,0 +1,69 @@
+"""Team of the Week selection for /generatetotw.
+
+One grouped query over the gameweek's rows scores every player in a
+division, and the best players for each position are then picked with a
+heap, so the cost grows with the number of players in the gameweek rather
+than with the league's history.
+"""
+import heapq
+
+from database import Database
+from stats import DIVISION_CODES, STAT_CODES
+
+# Slots per position, keeper first
+FORMATIONS = {
+    "4-3-3": {"GK": 1, "DEF": 4, "MID": 3, "FWD": 3},
+    "4-4-2": {"GK": 1, "DEF": 4, "MID": 4, "FWD": 2},
+    "3-5-2": {"GK": 1, "DEF": 3, "MID": 5, "FWD": 2},
+    "3-4-3": {"GK": 1, "DEF": 3, "MID": 4, "FWD": 3},
+}
+
+
+async def gameweek_points(database: Database, guild_id: int, season: int, gw: int, division: str) -> list:
+    """Return ``(user_id, position, points)`` for every player who scored in the gameweek.
+
+    Earlier TOTW awards are left out, so regenerating a week doesn't favour
+    the players it already picked.
+    """
+    # Without the hint the planner walks the whole guild in user order to skip sorting the groups
+    return await database.fetchall('''
+        SELECT g.user_id, p.position, SUM(g.count * w.points) AS points
+        FROM player_gw_stats g INDEXED BY idx_gw_stats_gameweek
+        JOIN point_weights w ON w.division = g.division AND w.stat_type = g.stat_type
+        LEFT JOIN player_stats p ON p.guild_id = g.guild_id AND p.user_id = g.user_id
+        WHERE g.guild_id = ? AND g.season = ? AND g.gw = ? AND g.division = ? AND g.stat_type != ?
+        GROUP BY g.user_id
+        HAVING points > 0
+    ''', (guild_id, season, gw, DIVISION_CODES[division], STAT_CODES["totw"]))
+
+
+def pick_team(players: list, formation: str) -> dict:
+    """Pick the top scorers per position; returns ``{position: [(user_id, points), ...]}``.
+
+    Ties go to the lower user id so the same week always gives the same team.
+    Players without a position can't be picked.
+    """
+    by_position = {position: [] for position in FORMATIONS[formation]}
+    for user_id, position, points in players:
+        if position in by_position:
+            by_position[position].append((points, -user_id))
+    return {
+        position: [(-negated_id, points) for points, negated_id in heapq.nlargest(slots, by_position[position])]
+        for position, slots in FORMATIONS[formation].items()
+    }
+
+
+async def award(conn, guild_id: int, season: int, gw: int, division: str, user_ids: list) -> bool:
+    """Record one ``totw`` for each player, unless this gameweek's TOTW was already awarded."""
+    async with conn.execute('''
+        SELECT 1 FROM player_gw_stats
+        WHERE guild_id = ? AND season = ? AND gw = ? AND division = ? AND stat_type = ?
+        LIMIT 1
+    ''', (guild_id, season, gw, DIVISION_CODES[division], STAT_CODES["totw"])) as cursor:
+        if await cursor.fetchone():
+            return False
+    await conn.executemany('''
+        INSERT INTO player_gw_stats (guild_id, user_id, gw, season, stat_type, count, division)
+        VALUES (?, ?, ?, ?, ?, 1, ?)
+    ''', [(guild_id, user_id, gw, season, STAT_CODES["totw"], DIVISION_CODES[division]) for user_id in user_ids])
+    return True
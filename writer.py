@@ -0,0 +1,91 @@
+"""Group-commit writer for the bot's small, frequent mutations.
+
+Commands submit an ``async def op(conn)`` and await its result. A single
+writer task collects whatever operations arrive within ``max_delay`` seconds
+and runs them in one transaction, each inside its own savepoint. If one
+operation fails, only its own changes are rolled back, and its caller gets
+the same exception it would have raised on its own. The others still
+commit together with a single fsync.
+
+The writer task runs operations on behalf of other tasks, so each one's time
+is handed back to its caller through ``on_write``, called in the context the
+operation was submitted from.
+"""
+import asyncio
+import contextvars
+import time
+
+from database import Database
+
+
+class WriteCoalescer:
+    def __init__(self, database: Database, max_delay: float = 0.005, max_batch: int = 64):
+        self.db = database
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._queue = asyncio.Queue()
+        self._task = None
+        # Optional on_write(seconds) callback, run in the submitter's context after every commit
+        self.on_write = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def submit(self, operation):
+        """Run ``operation(conn)`` in the next group commit and return its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((operation, future, contextvars.copy_context()))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self.max_delay:
+                await asyncio.sleep(self.max_delay)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._commit(batch)
+
+    async def _commit(self, batch: list):
+        outcomes = []
+        try:
+            async with self.db.transaction() as conn:
+                # An explicit BEGIN so releasing a savepoint never commits on its own
+                await conn.execute('BEGIN IMMEDIATE')
+                for operation, future, context in batch:
+                    if future.cancelled():
+                        continue
+                    started = time.perf_counter()
+                    await conn.execute('SAVEPOINT op')
+                    try:
+                        result, error = await operation(conn), None
+                    except Exception as e:
+                        await conn.execute('ROLLBACK TO SAVEPOINT op')
+                        result, error = None, e
+                    await conn.execute('RELEASE SAVEPOINT op')
+                    outcomes.append((future, context, result, error, time.perf_counter() - started))
+                committing = time.perf_counter()
+        except Exception as e:
+            # The commit itself failed, so nothing in the batch was written
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        # Every operation in the batch waited for the same commit
+        commit_seconds = time.perf_counter() - committing
+        for future, context, result, error, seconds in outcomes:
+            if self.on_write is not None:
+                context.run(self.on_write, seconds + commit_seconds)
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)